@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import abc
 import logging
-from typing import List, TYPE_CHECKING
+from collections import deque
+from typing import List, TYPE_CHECKING, Deque
 
 if TYPE_CHECKING:
     from dswizard.core.base_iteration import BaseIteration
@@ -21,6 +22,8 @@ class BanditLearner(abc.ABC):
             self.logger = logger
 
         self.iterations: List[BaseIteration] = []
+        # unfinished iterations in order of creation
+        self.active_iterations: Deque[BaseIteration] = deque()
         self.max_iterations = 0
 
     @abc.abstractmethod
@@ -45,23 +48,25 @@ class BanditLearner(abc.ABC):
         while True:
             next_candidate = None
             # find a new run to schedule
-            for i in filter(lambda idx: not self.iterations[idx].is_finished, range(len(self.iterations))):
-                next_candidate = self.iterations[i].get_next_candidate()
+            for it in self.active_iterations:
+                next_candidate = it.get_next_candidate()
                 if next_candidate is not None:
                     break
+            self._remove_finished_iterations()
 
             if next_candidate is not None:
                 # noinspection PyUnboundLocalVariable
                 yield next_candidate
             else:
                 # Ensure that current stage is completely done
-                busy = any([not it.is_finished for it in self.iterations])
+                busy = len(self.active_iterations) > 0
                 if busy:
                     yield None
                     continue
                 elif n_iterations > 0:  # we might be able to start the next iteration
                     iteration = len(self.iterations)
                     self.iterations.append(self._get_next_iteration(iteration, iteration_kwargs))
+                    self.active_iterations.append(self.iterations[-1])
                     n_iterations -= 1
                 else:
                     # Done
@@ -70,6 +75,15 @@ class BanditLearner(abc.ABC):
     def reset(self, offset: int):
         self.offset = offset
         self.iterations = []
+        self.active_iterations.clear()
 
     def register_result(self, cs: CandidateStructure, result: Result) -> CandidateStructure:
-        return self.iterations[-1].register_result(cs, result)
+        cs = self.iterations[-1].register_result(cs, result)
+        self._remove_finished_iterations()
+        return cs
+
+    def _remove_finished_iterations(self) -> None:
+        # Iterations are created in order and usually finish in order. Finished iterations behind an unfinished one
+        # are cheap to skip and are removed as soon as all preceding iterations finished
+        while len(self.active_iterations) > 0 and self.active_iterations[0].is_finished:
+            self.active_iterations.popleft()
@@ -30,6 +30,12 @@ class BaseIteration(abc.ABC):
         """
 
         self.data: Dict[CandidateId, CandidateStructure] = {}  # this holds all the candidates of this iteration
+        self.incumbent_losses: Dict[CandidateId, float] = {}  # best loss of each candidate under review
+        # index of all candidates by their current status to prevent scanning all candidates. Dicts are used as
+        # insertion ordered sets to keep the selection of candidates deterministic
+        self.candidates_by_status: Dict[str, Dict[CandidateId, None]] = {
+            status: {} for status in ('QUEUED', 'RUNNING', 'REVIEW', 'TERMINATED', 'CRASHED', 'COMPLETED')
+        }
         self.is_finished = False
         self.iteration = iteration
         self.stage = 0  # internal iteration, but different name for clarity
@@ -54,8 +60,9 @@ class BaseIteration(abc.ABC):
         if self.is_finished:
             raise RuntimeError("This SuccessiveHalving iteration is finished, you can't register more results!")
         cs = self.data[cs.cid]
-        cs.results.append(result)
-        cs.status = 'REVIEW'
+        cs.add_result(result)
+        self._set_status(cs, 'REVIEW')
+        self.incumbent_losses[cs.cid] = cs.get_incumbent().loss
         self.num_running -= 1
         return cs
 
@@ -79,18 +86,18 @@ class BaseIteration(abc.ABC):
             return None
 
         # Check if candidates exists from previous stage
-        candidates = list(filter(lambda cid: self.data[cid].status == 'QUEUED', self.data.keys()))
-        for cid in candidates:
+        cid = next(iter(self.candidates_by_status['QUEUED']), None)
+        if cid is not None:
             candidate = self.data[cid]
             assert candidate.budget == self.budgets[self.stage], 'Config budget does not align with current stage!'
-            candidate.status = 'RUNNING'
+            self._set_status(candidate, 'RUNNING')
             self.num_running += int(candidate.budget)
             return candidate
 
         # check if there are still slots to fill in the current stage and return that
         if self.actual_num_candidates[self.stage] < self.num_candidates[self.stage]:
             candidate = self._add_candidate()
-            candidate.status = 'RUNNING'
+            self._set_status(candidate, 'RUNNING')
             self.num_running += int(candidate.budget)
             return candidate
         elif self.num_running == 0:
@@ -121,6 +128,7 @@ class BaseIteration(abc.ABC):
         # candidate.timeout = timeout
 
         self.data[candidate_id] = candidate
+        self.candidates_by_status[candidate.status][candidate_id] = None
         self.actual_num_candidates[self.stage] += 1
 
         return candidate
@@ -137,7 +145,7 @@ class BaseIteration(abc.ABC):
         self.stage += 1
 
         # collect all candidate_ids that need to be compared
-        candidate_ids = list(filter(lambda cid: self.data[cid].status == 'REVIEW', self.data.keys()))
+        candidate_ids = list(self.candidates_by_status['REVIEW'])
 
         if self.stage >= len(self.num_candidates):
             self._finish_up()
@@ -147,7 +155,8 @@ class BaseIteration(abc.ABC):
         if len(set(budgets)) > 1:
             raise RuntimeError('Not all configurations have the same budget!')
 
-        losses = np.array([self.data[cid].get_incumbent().loss for cid in candidate_ids])
+        losses = np.fromiter((self.incumbent_losses[cid] for cid in candidate_ids), dtype=np.float64,
+                             count=len(candidate_ids))
         advance = self._advance_to_next_stage(losses)
 
         for i, cid in enumerate(candidate_ids):
@@ -156,19 +165,40 @@ class BaseIteration(abc.ABC):
                                   f'with loss {losses[i]}')
 
                 candidate = self.data[cid]
-                candidate.status = 'QUEUED'
+                self._set_status(candidate, 'QUEUED')
                 candidate.budget = self.budgets[self.stage]
                 # candidate.timeout = math.ceil(candidate.budget * self.timeout) if self.timeout is not None else None
                 self.actual_num_candidates[self.stage] += 1
             else:
-                self.data[cid].status = 'TERMINATED'
+                self._set_status(self.data[cid], 'TERMINATED')
 
     def _finish_up(self) -> None:
         self.is_finished = True
 
         for k, v in self.data.items():
             assert v.status in ['TERMINATED', 'REVIEW', 'CRASHED'], 'Configuration has not finshed yet!'
-            v.status = 'COMPLETED'
+            self._set_status(v, 'COMPLETED')
+
+    def _set_status(self, candidate: CandidateStructure, status: str) -> None:
+        self.candidates_by_status[candidate.status].pop(candidate.cid, None)
+        candidate.status = status
+        self.candidates_by_status[status][candidate.cid] = None
+
+    @staticmethod
+    def _select_best(losses: np.ndarray, k: int) -> np.ndarray:
+        """
+        Selects the k candidates with the lowest losses. Uses a partial sort as the order of the selected candidates is
+        irrelevant
+        :param losses: losses of the run on the current budget
+        :param k: number of candidates to select
+        :return: A boolean for each entry in losses indicating whether it is selected or not
+        """
+        advance = np.zeros(losses.shape[0], dtype=bool)
+        if k >= losses.shape[0]:
+            advance[:] = True
+        elif k > 0:
+            advance[np.argpartition(losses, k)[:k]] = True
+        return advance
 
     @abc.abstractmethod
     def _advance_to_next_stage(self, losses: np.ndarray) -> np.ndarray:
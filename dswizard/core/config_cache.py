@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING, Dict
+import queue
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional
 from typing import Type, Tuple
 
 import joblib
@@ -16,7 +18,7 @@ from dswizard.util import autoproxy
 
 if TYPE_CHECKING:
     from dswizard.core.base_config_generator import BaseConfigGenerator
-    from dswizard.core.model import Job
+    from dswizard.core.model import Result
     from dswizard.components.meta_features import MetaFeatures
 
 autoproxy.apply()
@@ -28,17 +30,46 @@ class ConfigCache:
         def __init__(self, model: Pipeline):
             self.store = SimilarityStore(model)
             self.generators = []
+            # Guards each generator against concurrent sampling and result registration
+            self.generator_locks = []
+            # Lookup of similar meta-features and creation of new generators have to be atomic
+            self.lock = threading.Lock()
 
         def add(self, mf, cg):
             self.store.add(mf)
+            # Lock has to exist before the generator becomes visible
+            self.generator_locks.append(threading.Lock())
             self.generators.append(cg)
             return len(self.generators) - 1
 
+        def __getstate__(self):
+            state = self.__dict__.copy()
+            # Locks can not be pickled
+            del state['lock']
+            del state['generator_locks']
+            return state
+
+        def __setstate__(self, state):
+            self.__dict__.update(state)
+            self.lock = threading.Lock()
+            self.generator_locks = [threading.Lock() for _ in self.generators]
+
+    class Initialization:
+
+        def __init__(self):
+            self.event = threading.Event()
+            self.error: Optional[Exception] = None
+
     def __init__(self,
                  clazz: Type[BaseConfigGenerator],
                  model: str = None,
                  init_kwargs: dict = None,
-                 logger: logging.Logger = None):
+                 logger: logging.Logger = None,
+                 async_results: bool = False):
+        """
+        :param async_results: register results in a background thread. Only intended for a ConfigCache shared via a
+            SyncManager. Otherwise, results are registered synchronously such that following samples consider them
+        """
         self.clazz = clazz
 
         try:
@@ -52,12 +83,25 @@ class ConfigCache:
 
         self.init_kwargs = init_kwargs
         self.cache: Dict[float, ConfigCache.Entry] = {}
+        # Signals that the first generator for a hash is initialized. Used when accessed concurrently via a proxy
+        self._init_events: Dict[float, ConfigCache.Initialization] = {}
 
         if logger is None:
             self.logger = logging.getLogger('ConfigCache')
         else:
             self.logger = logger
 
+        self._closed = False
+        if async_results:
+            # Results are registered by a single background thread to not block the callers on the config generators
+            self._results: Optional[queue.SimpleQueue] = queue.SimpleQueue()
+            self._result_thread: Optional[threading.Thread] = threading.Thread(
+                target=self._process_results, name='ConfigCacheResults', daemon=True)
+            self._result_thread.start()
+        else:
+            self._results = None
+            self._result_thread = None
+
     def get_config_key(self,
                        configspace: ConfigurationSpace = None,
                        mf: MetaFeatures = None,
@@ -67,20 +111,50 @@ class ConfigCache:
             raise ValueError('If cfg_key is not given, both configspace and mf must not be None.')
 
         hash_key = hash(configspace)
-        if hash_key not in self.cache:
-            self.cache[hash_key] = ConfigCache.Entry(self.model)
-            cg = self.clazz(configspace, **{**self.init_kwargs, **kwargs})
-            idx = self.cache[hash_key].add(mf, cg)
-            return ConfigKey(hash_key, idx)
+        entry = self.cache.get(hash_key)
+        if entry is None:
+            init = ConfigCache.Initialization()
+            existing = self._init_events.setdefault(hash_key, init)
+            if existing is init:
+                # Only the first caller creates the entry. All concurrent callers wait for the initialization
+                try:
+                    entry = ConfigCache.Entry(self.model)
+                    cg = self.clazz(configspace, **{**self.init_kwargs, **kwargs})
+                    idx = entry.add(mf, cg)
+                    self.cache[hash_key] = entry
+                    return ConfigKey(hash_key, idx)
+                except Exception as ex:
+                    # Report failure to all waiting callers and allow later calls to retry the initialization
+                    init.error = ex
+                    del self._init_events[hash_key]
+                    raise
+                finally:
+                    init.event.set()
+            existing.event.wait()
+            if existing.error is not None:
+                raise RuntimeError(f'Initialization of config generator for {hash_key} failed') from existing.error
+            entry = self.cache[hash_key]
 
-        entry = self.cache[hash_key]
-        distance, idx = entry.store.get_similar(mf)
-        if distance[0][0] <= max_distance:
-            return ConfigKey(hash_key, int(idx[0][0]))
-        else:
-            cg = self.clazz(configspace, **{**self.init_kwargs, **kwargs})
-            idx = self.cache[hash_key].add(mf, cg)
-            return ConfigKey(hash_key, idx)
+        with entry.lock:
+            distance, idx = entry.store.get_similar(mf)
+            if distance[0][0] <= max_distance:
+                return ConfigKey(hash_key, int(idx[0][0]))
+            else:
+                cg = self.clazz(configspace, **{**self.init_kwargs, **kwargs})
+                idx = entry.add(mf, cg)
+                return ConfigKey(hash_key, idx)
+
+    def get_config_keys(self,
+                        configspaces: List[ConfigurationSpace],
+                        mfs: List[MetaFeatures],
+                        max_distance: float = 0.05,
+                        **kwargs) -> List[ConfigKey]:
+        """
+        Batched version of get_config_key for all steps of a pipeline. When used via a proxy, all ConfigKeys are
+        obtained with a single round-trip.
+        """
+        return [self.get_config_key(configspace, mf, max_distance, **kwargs) for configspace, mf in
+                zip(configspaces, mfs)]
 
     def sample_configuration(self,
                              cfg_key: ConfigKey = None,
@@ -90,27 +164,95 @@ class ConfigCache:
                              default: bool = False, **kwargs) -> Tuple[Configuration, ConfigKey]:
         if cfg_key is None:
             cfg_key = self.get_config_key(configspace, mf, max_distance, **kwargs)
-        cg = self.cache[cfg_key.hash].generators[cfg_key.idx]
-        config = cg.sample_config(default=default)
+        entry = self.cache[cfg_key.hash]
+        with entry.generator_locks[cfg_key.idx]:
+            config = entry.generators[cfg_key.idx].sample_config(default=default)
         return config, cfg_key
 
+    def sample_configurations(self,
+                              cfg_keys: List[ConfigKey],
+                              default: bool = False) -> List[Tuple[Configuration, ConfigKey]]:
+        """
+        Batched version of sample_configuration for multiple known ConfigKeys. When used via a proxy, all
+        configurations are obtained with a single round-trip.
+        """
+        return [self.sample_configuration(cfg_key=cfg_key, default=default) for cfg_key in cfg_keys]
+
+    def register_result(self,
+                        result: Result,
+                        cfg_keys: Optional[List[ConfigKey]] = None,
+                        config: Optional[Configuration] = None) -> None:
+        """
+        Registers the result of an evaluation. Only the data required for the config generators is passed instead of
+        the complete job, as the job contains the whole data set, which would be pickled on each call via a proxy.
+        :param result: result of the evaluation
+        :param cfg_keys: ConfigKeys of the evaluated pipeline. Only used if result contains no partial configs
+        :param config: evaluated configuration. Only used if result contains no partial configs
+        """
+        if self._result_thread is None or self._closed:
+            self._register_result(result, cfg_keys, config)
+        else:
+            self._results.put((result, cfg_keys, config))
+
+    def close(self) -> None:
+        """
+        Registers all pending results and stops the background thread. Results registered afterwards are processed
+        synchronously.
+        """
+        if self._result_thread is None or self._closed:
+            return
+        self._closed = True
+        self._results.put(None)
+        self._result_thread.join()
+        # Results enqueued concurrently to closing are still pending
+        while True:
+            try:
+                item = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._register_result(*item)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Threads, queues and locks can not be pickled. Copies always register their results synchronously
+        state['_results'] = None
+        state['_result_thread'] = None
+        state['_init_events'] = {}
+        return state
+
+    def _process_results(self) -> None:
+        while True:
+            item = self._results.get()
+            if item is None:
+                break
+            self._register_result(*item)
+
+    def _register_generator_result(self, hash_key: float, idx: int, config: Configuration, loss, status) -> None:
+        entry = self.cache[hash_key]
+        with entry.generator_locks[idx]:
+            entry.generators[idx].register_result(config, loss, status)
+
     # noinspection PyUnresolvedReferences
-    def register_result(self, job: Job) -> None:
+    def _register_result(self,
+                         result: Result,
+                         cfg_keys: Optional[List[ConfigKey]],
+                         config: Optional[Configuration]) -> None:
         try:
-            loss = job.result.loss
-            status = job.result.status
+            loss = result.loss
+            status = result.status
 
             if loss is None:
                 return
 
-            if len(job.result.partial_configs) > 0:
-                for config in job.result.partial_configs:
-                    if config.cfg_key is None or config.is_empty():
+            if len(result.partial_configs) > 0:
+                for partial_config in result.partial_configs:
+                    if partial_config.cfg_key is None or partial_config.is_empty():
                         continue
-                    self.cache[config.cfg_key[0]].generators[config.cfg_key[1]] \
-                        .register_result(config.config, loss, status)
+                    self._register_generator_result(partial_config.cfg_key[0], partial_config.cfg_key[1],
+                                                    partial_config.config, loss, status)
             else:
-                cfg_key = job.cfg_keys[0]
-                self.cache[cfg_key[0]].generators[cfg_key[1]].register_result(job.config, loss, status)
+                cfg_key = cfg_keys[0]
+                self._register_generator_result(cfg_key[0], cfg_key[1], config, loss, status)
         except Exception as ex:
             self.logger.exception("Failed to register results")
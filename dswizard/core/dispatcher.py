@@ -5,7 +5,7 @@ import multiprocessing
 import threading
 import time
 import timeit
-from typing import Dict, List, TYPE_CHECKING, Union, Callable
+from typing import Dict, List, TYPE_CHECKING, Union, Callable, Tuple
 
 from dswizard.core.model import EvaluationJob, StructureJob, CandidateId, CandidateStructure
 
@@ -57,28 +57,39 @@ class Dispatcher:
         self.condition = threading.Condition()
 
     def submit_job(self, job: Job, callback: Callable) -> None:
+        self.submit_jobs([(job, callback)])
+
+    def submit_jobs(self, jobs: List[Tuple[Job, Callable]]) -> None:
+        """
+        Submits multiple jobs at once. The delay for process startup is only awaited once per batch. If all workers are
+        busy, submission blocks until a worker is available.
+        :param jobs: list of jobs and the callbacks invoked after the corresponding job finished
+        """
         with self.condition:
-            n_running = len(self.running_jobs)
-            job.time_submitted = time.time()
-            self.running_jobs[job.cid] = callback
+            for job, callback in jobs:
+                while len(self.running_jobs) >= len(self.worker_pool):
+                    self.logger.debug('waiting for next worker to be available')
+                    # TODO infinite waiting is possible
+                    self.condition.wait()
+
+                n_running = len(self.running_jobs)
+                job.time_submitted = time.time()
+                self.running_jobs[job.cid] = callback
+
+                if len(self.worker_pool) > 1:
+                    self.pool.apply_async(self._process_job, args=(self.worker_pool[n_running], job),
+                                          callback=self._job_callback)
+                else:
+                    res = self._process_job(self.worker_pool[0], job)
+                    self._job_callback(res)
 
             if len(self.worker_pool) > 1:
-                self.pool.apply_async(self._process_job, args=(self.worker_pool[n_running], job),
-                                      callback=self._job_callback)
                 # Sleep 1 second to ensure process start. Maybe not necessary
                 time.sleep(1)
-            else:
-                res = self._process_job(self.worker_pool[0], job)
-                self._job_callback(res)
-
-            if len(self.running_jobs) == len(self.worker_pool):
-                self.logger.debug('waiting for next worker to be available')
-                # TODO infinite waiting is possible
-                self.condition.wait()
 
     def _process_job(self, worker: Worker, job: Job) -> \
             Union[EvaluationJob, CandidateStructure]:
-        self.logger.debug(f'Processing job {job.cid}')
+        self.logger.debug('Processing job %s', job.cid)
         job.time_started = time.time()
         worker.runs_job = job.cid
 
@@ -88,7 +99,7 @@ class Dispatcher:
                 job.result = result
                 # necessary if config was generated on the fly
                 job.config = result.config
-                self.logger.debug(f'job {job.cid} finished with: {result.status} -> {result.loss}')
+                self.logger.debug('job %s finished with: %s -> %s', job.cid, result.status, result.loss)
                 job.time_finished = timeit.default_timer()
                 return job
             except Exception as ex:
@@ -99,7 +110,7 @@ class Dispatcher:
             try:
                 cs = self.structure_generator.fill_candidate(job.cs, job.ds, cutoff=job.cutoff, worker=worker)
                 job.time_finished = timeit.default_timer()
-                self.logger.debug(f'job {job.cid} finished')
+                self.logger.debug('job %s finished', job.cid)
                 return cs
             except Exception as ex:
                 # Catch all. Should never happen
@@ -124,7 +135,7 @@ class Dispatcher:
             now = timeit.default_timer()
             with self.condition:
                 busy = len(self.running_jobs)
-                self.logger.debug(f'Waiting for all workers to finish current work. {busy} / {total} busy...')
+                self.logger.debug('Waiting for all workers to finish current work. %d / %d busy...', busy, total)
                 if busy == 0:
                     break
                 else:
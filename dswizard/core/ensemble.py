@@ -1,6 +1,8 @@
 import glob
+import heapq
 import itertools
 import logging
+import operator
 import os
 import timeit
 from typing import List, Tuple
@@ -80,9 +82,10 @@ class EnsembleBuilder:
                 ls = joblib.load(f)
             steps[file.split('-')[1][:-4]] = ls
 
-        runs = sorted(rh.get_all_runs(), key=lambda x: x[1].loss)
+        runs = rh.get_all_runs()
         n_models = min(self.max_models, max(int(len(runs) * (1.0 - self.prune_fraction)), self.min_models))
-        runs = runs[:n_models]
+        # Only the best runs are used. Select them without sorting all runs
+        runs = heapq.nsmallest(n_models, runs, key=lambda x: x[1].loss)
 
         # Load models with tuned hyperparameters
         for cid, result in runs:
@@ -108,7 +111,7 @@ class EnsembleBuilder:
                 self._data.append((score, model, y_prob))
             except Exception:
                 n_failed += 1
-        self._data.sort(key=lambda x: x[0])
+        self._data.sort(key=operator.itemgetter(0))
         self.logger.info(f'Loaded {len(self._data)} models. Failed to load {n_failed} models')
 
     def _build_ensemble(self, ds: Dataset):
@@ -133,7 +136,7 @@ class EnsembleBuilder:
             score, ens = self._ensemble_from_candidates(ds.X, ds.y, ds.metric, c)
             if ens is not None:
                 self.ensembles_.append((score, ens))
-        self.ensembles_.sort(key=lambda x: x[0])
+        self.ensembles_.sort(key=operator.itemgetter(0))
         return self
 
     def _ensemble_from_candidates(self, X, y, metric, candidates) -> Tuple[float, PrefitVotingClassifier]:
@@ -3,9 +3,10 @@ from __future__ import annotations
 import json
 import logging
 import os
-from typing import TYPE_CHECKING, List, Tuple, Dict
+from typing import TYPE_CHECKING, List, Tuple, Dict, Optional, IO, Iterator, Any
 
 import networkx as nx
+import numpy as np
 from ConfigSpace import Configuration
 
 from dswizard.components.util import prefixed_name
@@ -16,27 +17,67 @@ if TYPE_CHECKING:
     from dswizard.pipeline.pipeline import FlexiblePipeline
 
 
+try:
+    import orjson
+
+    def _dumps(obj) -> str:
+        raw = orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        # orjson silently writes NaN and Infinity as null. Only records containing null are serialized again with json
+        # to preserve those values
+        if b'null' in raw:
+            return json.dumps(obj)
+        return raw.decode()
+
+    def _loads(raw: str):
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # orjson rejects NaN and Infinity which are written by the json module
+            return json.loads(raw)
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not msgpack serializable')
+
+
 class JsonResultLogger:
-    def __init__(self, directory: str, init: bool = True, overwrite: bool = False):
+    def __init__(self, directory: str, init: bool = True, overwrite: bool = False, file_format: str = 'json'):
         """
         convenience logger for 'semi-live-results'
 
         Logger that writes job results into two files (configs.json and results.json). Both files contain proper json
-        objects in each line.  This version opens and closes the files for each result. This might be very slow if
-        individual runs are fast and the filesystem is rather slow (e.g. a NFS).
+        objects in each line. Both files are kept open in line buffered mode until `close` is called to avoid opening
+        the files for each result, which might be very slow on a slow filesystem (e.g. a NFS).
         :param directory: the directory where the two files 'configs.json' and 'results.json' are stored
         :param overwrite: In case the files already exist, this flag controls the
             behavior:
                 * True:   The existing files will be overwritten. Potential risk of deleting previous results
                 * False:  A FileExistsError is raised and the files are not modified.
+        :param file_format: either 'json' for one json object per line or 'msgpack' for a more compact binary stream of
+            MessagePack objects. The latter requires msgpack to be installed
         """
 
+        if file_format == 'msgpack':
+            import msgpack
+            self._msgpack = msgpack
+        elif file_format != 'json':
+            raise ValueError(f'Unknown file format {file_format}')
+        else:
+            self._msgpack = None
         os.makedirs(directory, exist_ok=True)
 
         self.directory = directory
-        self.structure_fn = os.path.join(directory, 'structures.json')
-        self.results_fn = os.path.join(directory, 'results.json')
+        self.file_format = file_format
+        self.structure_fn = os.path.join(directory, f'structures.{file_format}')
+        self.results_fn = os.path.join(directory, f'results.{file_format}')
         self.structure_ids = set()
+        self._structure_fh: Optional[IO] = None
+        self._results_fh: Optional[IO] = None
 
         if init:
             try:
@@ -62,9 +103,9 @@ class JsonResultLogger:
     def new_structure(self, structure: CandidateStructure, draw_structure: bool = False) -> None:
         if structure.cid.without_config() not in self.structure_ids:
             self.structure_ids.add(structure.cid.without_config())
-            with open(self.structure_fn, 'a') as fh:
-                fh.write(json.dumps(structure.as_dict()))
-                fh.write('\n')
+            if self._structure_fh is None:
+                self._structure_fh = self._open(self.structure_fn)
+            self._write(self._structure_fh, structure.as_dict())
 
             # Results may already be created during structure creation
             for idx, result in enumerate(structure.results):
@@ -79,28 +120,53 @@ class JsonResultLogger:
         if cid.without_config() not in self.structure_ids:
             # should never happen!
             raise ValueError(f'Unknown structure {cid.without_config()}')
-        with open(self.results_fn, 'a') as fh:
-            fh.write(
-                json.dumps([cid.as_tuple(), result.as_dict() if result is not None else None])
-            )
-            fh.write("\n")
+        if self._results_fh is None:
+            self._results_fh = self._open(self.results_fn)
+        self._write(self._results_fh, [cid.as_tuple(), result.as_dict() if result is not None else None])
+
+    def _open(self, file: str) -> IO:
+        if self._msgpack is None:
+            return open(file, 'a', buffering=1)
+        else:
+            return open(file, 'ab')
+
+    def _write(self, fh: IO, obj) -> None:
+        if self._msgpack is None:
+            fh.write(_dumps(obj) + '\n')
+        else:
+            fh.write(self._msgpack.packb(obj, use_bin_type=True, default=_msgpack_default))
+            # Records have to be visible immediately, similar to line buffering
+            fh.flush()
+
+    def _read(self, file: str) -> Iterator[Any]:
+        if self._msgpack is None:
+            loads = _loads
+            with open(file, 'r', buffering=1 << 20) as fh:
+                for line in fh:
+                    # Skip empty lines, e.g. a trailing newline
+                    if line.strip():
+                        yield loads(line)
+        else:
+            with open(file, 'rb', buffering=1 << 20) as fh:
+                yield from self._msgpack.Unpacker(fh, raw=False)
+
+    def close(self) -> None:
+        for fh in (self._structure_fh, self._results_fh):
+            if fh is not None:
+                fh.close()
+        self._structure_fh = None
+        self._results_fh = None
 
     def load(self) -> Dict[CandidateId, CandidateStructure]:
         structures = {}
-        with open(self.structure_fn, 'r') as structure_file:
-            for line in structure_file:
-                raw = json.loads(line)
-                cs = CandidateStructure.from_dict(raw)
-                structures[cs.cid] = cs
-
-        with open(self.results_fn, 'r') as result_file:
-            for line in result_file:
-                raw = json.loads(line)
-                cid = CandidateId(*raw[0])
-
-                cs = structures[cid.without_config()]
-                res = Result.from_dict(raw[1], cs.configspace)
-                cs.add_result(res)
+        for raw in self._read(self.structure_fn):
+            cs = CandidateStructure.from_dict(raw)
+            structures[cs.cid] = cs
+
+        for raw in self._read(self.results_fn):
+            iteration, structure, _ = raw[0]
+            cs = structures[CandidateId(iteration, structure)]
+            cs.add_result(Result.from_dict(raw[1], cs.configspace))
         return structures
 
 
@@ -123,6 +189,7 @@ class ProcessLogger:
     def new_step(self, name: str, config: PartialConfig) -> None:
         self.partial_configs.append(config)
         with open(self.file, 'a') as fh:
+            # Config vectors contain NaN for inactive hyperparameters. Always use json to preserve them
             fh.write(json.dumps([name, config.as_dict()]))
             fh.write('\n')
 
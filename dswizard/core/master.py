@@ -5,6 +5,7 @@ import logging
 import math
 import multiprocessing
 import os
+import queue
 import random
 import tempfile
 import threading
@@ -49,8 +50,9 @@ class Master:
                  structure_cutoff_factor: float = 2.,
                  pre_sample: bool = False,
 
-                 n_workers: int = 1,
+                 n_workers: Optional[int] = 1,
                  worker_class: Type[Worker] = SklearnWorker,
+                 worker_kwargs: dict = None,
 
                  config_generator_class: Type[BaseConfigGenerator] = Hyperopt,
                  config_generator_kwargs: dict = None,
@@ -68,6 +70,8 @@ class Master:
         :param working_directory: The top level working directory accessible to all compute nodes(shared filesystem).
         :param logger: the logger to output some (more or less meaningful) information
         :param result_logger: a result logger that writes live results to disk
+        :param n_workers: number of worker processes. If None, one worker per available CPU core is used while one core
+            is reserved for the Master
         """
 
         if bandit_learner_kwargs is None:
@@ -76,6 +80,8 @@ class Master:
             config_generator_kwargs = {}
         if structure_generator_kwargs is None:
             structure_generator_kwargs = {}
+        if worker_kwargs is None:
+            worker_kwargs = {}
 
         self.working_directory = working_directory
         os.makedirs(self.working_directory, exist_ok=True)
@@ -88,6 +94,18 @@ class Master:
         else:
             self.logger = logger
 
+        n_cpus = os.cpu_count() or 1
+        if n_workers is None:
+            n_workers = max(1, n_cpus - 1)
+        elif n_workers > n_cpus:
+            self.logger.warning(f'Using {n_workers} workers on only {n_cpus} CPU cores. Performance may degrade due '
+                                f'to oversubscription')
+
+        if n_workers > 1 and worker_kwargs.get('n_jobs', 1) != 1:
+            # Each worker already runs in its own process. Additional process pools per worker oversubscribe the CPUs
+            self.logger.warning(f'Ignoring n_jobs={worker_kwargs["n_jobs"]} as {n_workers} workers are used')
+            worker_kwargs['n_jobs'] = 1
+
         if result_logger is None:
             result_logger = JsonResultLogger(self.working_directory, overwrite=True)
         self.result_logger = result_logger
@@ -105,6 +123,10 @@ class Master:
         # condition to synchronize the job_callback and the queue
         self.thread_cond = threading.Condition()
         self.incomplete_structures: Dict[CandidateId, Tuple[CandidateStructure, int, int]] = {}
+        # finished evaluations are processed in a dedicated thread to not block the dispatcher
+        self.evaluation_queue: queue.Queue = queue.Queue()
+        self.evaluation_thread = threading.Thread(target=self._process_evaluations, name='EvaluationCallback',
+                                                  daemon=True)
 
         if n_workers < 1:
             raise ValueError(f'Expected at least 1 worker, given {n_workers}')
@@ -129,7 +151,8 @@ class Master:
             self.cfg_cache: ConfigCache = self.mgr.ConfigCache(
                 clazz=config_generator_class,
                 init_kwargs=config_generator_kwargs,
-                model=model)
+                model=model,
+                async_results=True)
             # noinspection PyUnresolvedReferences
             self.structure_generator: BaseStructureGenerator = self.mgr.StructureGenerator(
                 cfg_cache=self.cfg_cache,
@@ -141,7 +164,7 @@ class Master:
 
         self.workers = []
         for i in range(n_workers):
-            worker = worker_class(wid=str(i), cfg_cache=self.cfg_cache, workdir=self.temp_dir.name)
+            worker = worker_class(wid=str(i), cfg_cache=self.cfg_cache, workdir=self.temp_dir.name, **worker_kwargs)
             self.workers.append(worker)
 
         self.dispatcher = Dispatcher(self.workers, self.structure_generator)
@@ -153,6 +176,15 @@ class Master:
         time.sleep(1)
         self.structure_generator.shutdown()
         self.dispatcher.shutdown()
+        if self.evaluation_thread.is_alive():
+            # Process all remaining evaluations before the SyncManager is stopped
+            self.evaluation_queue.put(None)
+            self.evaluation_thread.join()
+        # Register all pending results before the SyncManager is stopped
+        self.cfg_cache.close()
+        self.ds.release()
+        if self.result_logger is not None:
+            self.result_logger.close()
         if self.mgr is not None:
             self.mgr.shutdown()
 
@@ -177,6 +209,14 @@ class Master:
         for worker in self.workers:
             worker.start_time = start
         deadline = start + self.wallclock_limit
+        if len(self.workers) > 1:
+            # Prevent pickling of complete data set for each job send to a worker process
+            self.ds.share()
+        if not self.evaluation_thread.is_alive():
+            # Threads can only be started once. Create a new one if optimize is called repeatedly
+            self.evaluation_thread = threading.Thread(target=self._process_evaluations, name='EvaluationCallback',
+                                                      daemon=True)
+            self.evaluation_thread.start()
 
         def _optimize() -> bool:
             # Basic optimization logic without parallelism
@@ -203,10 +243,17 @@ class Master:
                     self.dispatcher.finish_work(self.cutoff)
                     return True
 
-                job = None
+                jobs = []
                 with self.thread_cond:
-                    # Create EvaluationJob if possible
-                    if len(self.incomplete_structures) > 0:
+                    n_idle = len(self.workers) - len(self.dispatcher.running_jobs)
+                    if n_idle <= 0:
+                        # All workers are busy. Finished jobs notify thread_cond after being processed
+                        # noinspection PyTypeChecker
+                        self.thread_cond.wait(max(self.cutoff, deadline - timeit.default_timer()))
+                        continue
+
+                    # Create EvaluationJobs for all idle workers if possible
+                    while len(self.incomplete_structures) > 0 and len(jobs) < n_idle:
                         # TODO random selection mostly does not work as len(self.incomplete_structures) == 1
                         cid = random.choice(list(self.incomplete_structures.keys()))
                         candidate, n_configs, running = self.incomplete_structures[cid]
@@ -222,20 +269,21 @@ class Master:
                             cfg_keys = candidate.cfg_keys
 
                         job = EvaluationJob(self.ds, config_id, candidate, self.cutoff, config, cfg_keys)
-                        callback = self._evaluation_callback
+                        jobs.append((job, self._evaluation_callback))
 
                         if n_configs > 1:
                             self.incomplete_structures[cid] = candidate, n_configs - 1, running + 1
                         else:
                             del self.incomplete_structures[cid]
                     # Select new CandidateStructure if possible
-                    else:
+                    if len(jobs) == 0:
                         try:
                             candidate = next(it)
                             if candidate is None:
-                                self.logger.debug(f'Waiting for next job to finish. '
-                                                  f'Currently {len(self.dispatcher.running_jobs)} running, '
-                                                  f'{self.bandit_learner.iterations[-1].num_running} outstanding')
+                                self.logger.debug('Waiting for next job to finish. '
+                                                  'Currently %d running, %d outstanding',
+                                                  len(self.dispatcher.running_jobs),
+                                                  self.bandit_learner.iterations[-1].num_running)
                                 # Safety-net to prevent infinite waiting
                                 # noinspection PyTypeChecker
                                 self.thread_cond.wait(max(self.cutoff, deadline - timeit.default_timer()))
@@ -243,7 +291,7 @@ class Master:
 
                             if candidate.is_proxy():
                                 job = StructureJob(self.ds, candidate, self.structure_cutoff_factor * self.cutoff)
-                                callback = self._structure_callback
+                                jobs.append((job, self._structure_callback))
                             else:
                                 n_configs = int(candidate.budget)
                                 self.incomplete_structures[candidate.cid] = candidate, n_configs, 0
@@ -251,8 +299,8 @@ class Master:
                             # Current optimization is exhausted
                             return False
 
-                if job is not None:
-                    self.dispatcher.submit_job(job, callback)
+                if len(jobs) > 0:
+                    self.dispatcher.submit_jobs(jobs)
 
         # while time_limit is not exhausted:
         #   structure, budget = structure_generator.get_next_structure()
@@ -269,6 +317,7 @@ class Master:
             while not timeout:
                 # noinspection PyTypeChecker
                 self.dispatcher.finish_work(max(self.cutoff, deadline - timeit.default_timer()))
+                self.evaluation_queue.join()
                 self.logger.info(f'Starting repetition {repetition}')
                 self.bandit_learner.reset(offset)
                 timeout = _optimize()
@@ -309,43 +358,61 @@ class Master:
 
     def _evaluation_callback(self, job: EvaluationJob) -> None:
         """
-        method to be called when an evaluation has finished
+        method to be called when an evaluation has finished. The job is only enqueued, the actual processing is done
+        asynchronously by _process_evaluations
 
         :param job: Finished Job
         :return:
         """
-        self.logger.debug(f'Evaluation callback {job.cid}')
-        with self.thread_cond:
+        self.logger.debug('Evaluation callback %s', job.cid)
+        self.evaluation_queue.put(job)
+
+    def _process_evaluations(self) -> None:
+        while True:
+            job: Optional[EvaluationJob] = self.evaluation_queue.get()
             try:
-                if job.config is None:
-                    self.logger.error(
-                        f'Encountered job without a configuration: {job.cid}. Using empty config as fallback')
-                    job.config = ConfigurationSpace().get_default_configuration()
+                if job is None:
+                    return
+                self._register_evaluation(job)
+            finally:
+                self.evaluation_queue.task_done()
+
+    def _register_evaluation(self, job: EvaluationJob) -> None:
+        try:
+            if job.config is None:
+                self.logger.error(
+                    f'Encountered job without a configuration: {job.cid}. Using empty config as fallback')
+                job.config = ConfigurationSpace().get_default_configuration()
 
+            # Only the state shared with the optimization loop has to be guarded
+            with self.thread_cond:
                 if self.result_logger is not None:
                     self.result_logger.log_evaluated_config(job.cid, job.result)
 
                 cs = self.bandit_learner.register_result(job.cs, job.result)
-                self.structure_generator.register_result(job.cs, job.result)
-                self.cfg_cache.register_result(job)
 
                 # Decrease number of running jobs
                 if job.cs.cid in self.incomplete_structures:
                     _, n_configs, running = self.incomplete_structures[job.cs.cid]
                     self.incomplete_structures[job.cs.cid] = cs, n_configs, running - 1
-            except KeyboardInterrupt:
-                raise
-            except (BrokenPipeError, EOFError) as ex:
-                self.logger.fatal(f'Lost connection to SyncManager probably due to OOM. Aborting...: {ex}',
-                                  exc_info=True)
-                self.abort = True
-            except Exception as ex:
-                self.logger.fatal(f'Encountered unhandled exception {ex}. This should never happen!', exc_info=True)
-            finally:
+                self.thread_cond.notify_all()
+
+            self.structure_generator.register_result(job.cs, job.result)
+            self.cfg_cache.register_result(job.result, job.cfg_keys, job.config)
+        except KeyboardInterrupt:
+            raise
+        except (BrokenPipeError, EOFError) as ex:
+            self.logger.fatal(f'Lost connection to SyncManager probably due to OOM. Aborting...: {ex}',
+                              exc_info=True)
+            self.abort = True
+        except Exception as ex:
+            self.logger.fatal(f'Encountered unhandled exception {ex}. This should never happen!', exc_info=True)
+        finally:
+            with self.thread_cond:
                 self.thread_cond.notify_all()
 
     def _structure_callback(self, cs: CandidateStructure):
-        self.logger.debug(f'Structure callback {cs.cid}')
+        self.logger.debug('Structure callback %s', cs.cid)
         with self.thread_cond:
             try:
                 if cs.is_proxy():
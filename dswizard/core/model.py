@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import os
+import weakref
 from collections import namedtuple
+from functools import lru_cache
 from enum import Enum
-from typing import Optional, List, TYPE_CHECKING, Tuple, Union
+from typing import Optional, List, TYPE_CHECKING, Tuple, Union, Dict
 
 import numpy as np
 from ConfigSpace import ConfigurationSpace
@@ -18,6 +21,18 @@ if TYPE_CHECKING:
     from dswizard.pipeline.pipeline import FlexiblePipeline
     from dswizard.components.meta_features import MetaFeatures
 
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # shared_memory is only available for Python >= 3.8
+    shared_memory = None
+
+if shared_memory is not None and os.name == 'posix':
+    from multiprocessing import resource_tracker
+else:
+    # Shared memory is only tracked on POSIX systems
+    resource_tracker = None
+
 
 class StatusType(Enum):
     """Class to define numbers for status types"""
@@ -34,12 +49,42 @@ class StatusType(Enum):
 # Namedtuple instead of class to allow sharing between processes
 ConfigKey = namedtuple('ConfigKey', 'hash idx')
 
+_configspace_json: Dict[int, str] = {}
+
+
+def _write_configspace(configspace: ConfigurationSpace) -> str:
+    """
+    Serializes a ConfigurationSpace to json. Serialization is cached per instance as the same configuration space is
+    serialized for each result of a structure. Configuration spaces must not be modified after being serialized.
+    """
+    key = id(configspace)
+    raw = _configspace_json.get(key)
+    if raw is None:
+        raw = config_json.write(configspace)
+        try:
+            # Remove entry once the configuration space is garbage collected as the id may be reused
+            weakref.finalize(configspace, _configspace_json.pop, key, None)
+            _configspace_json[key] = raw
+        except TypeError:
+            pass
+    return raw
+
+
+@lru_cache(maxsize=128)
+def _read_configspace(raw: str) -> ConfigurationSpace:
+    """
+    Deserializes a ConfigurationSpace from json. Many logged structures and partial configs share an identical
+    configuration space, which is parsed only once. The returned instances are shared and must not be modified.
+    """
+    return config_json.read(raw)
+
 
 class CandidateId:
     """
     a triplet of ints that uniquely identifies a configuration. the convention is id = (iteration, budget index,
     running index)
     """
+    __slots__ = ('iteration', 'structure', 'config', '_tuple', '_hash')
 
     def __init__(self, iteration: int, structure: int, config: int = None):
         """
@@ -55,15 +100,28 @@ class CandidateId:
         self.iteration = iteration
         self.structure = structure
         self.config = config
+        # CandidateIds are immutable and used as keys in many dicts
+        self._tuple = (iteration, structure, config)
+        self._hash = hash(self._tuple)
 
     def as_tuple(self):
-        return self.iteration, self.structure, self.config
+        return self._tuple
 
     def with_config(self, config: int) -> 'CandidateId':
-        return CandidateId(self.iteration, self.structure, config)
+        return self._derive(config)
 
     def without_config(self) -> 'CandidateId':
-        return CandidateId(self.iteration, self.structure)
+        return self._derive(None)
+
+    def _derive(self, config: Optional[int]) -> 'CandidateId':
+        # Fast path bypassing __init__. Derived ids are created frequently when submitting jobs
+        cid = CandidateId.__new__(CandidateId)
+        cid.iteration = self.iteration
+        cid.structure = self.structure
+        cid.config = config
+        cid._tuple = (self.iteration, self.structure, config)
+        cid._hash = hash(cid._tuple)
+        return cid
 
     def __repr__(self):
         return str(self)
@@ -72,7 +130,11 @@ class CandidateId:
         return str(self.as_tuple())
 
     def __hash__(self):
-        return hash(self.as_tuple())
+        return self._hash
+
+    def __reduce__(self):
+        # hash of None is not stable between processes. Recompute hash after unpickling
+        return CandidateId, self._tuple
 
     def __eq__(self, other):
         return self.as_tuple() == other.as_tuple()
@@ -82,6 +144,7 @@ class CandidateId:
 
 
 class Runtime:
+    __slots__ = ('total', 'timestamp')
 
     def __init__(self, total: float, timestamp: float):
         self.total = total
@@ -101,6 +164,7 @@ class Runtime:
 
 
 class Result:
+    __slots__ = ('status', 'config', 'loss', 'structure_loss', 'runtime', 'transformed_X', 'partial_configs')
 
     def __init__(self,
                  status: Optional[StatusType] = None,
@@ -146,6 +210,7 @@ class CandidateStructure:
                  pipeline: FlexiblePipeline,
                  cfg_keys: List[ConfigKey],
                  budget: float = 1):
+        self._configspace_hash: Optional[int] = None
         self.configspace = configspace
         self.pipeline = pipeline
         self.cfg_keys = cfg_keys
@@ -156,23 +221,43 @@ class CandidateStructure:
         self.status: str = 'QUEUED'
 
         self.results: List[Result] = []
+        self._incumbent: Optional[Result] = None
 
     def get_incumbent(self) -> Optional[Result]:
-        if len(self.results) == 0:
-            return None
-        return min(self.results, key=lambda res: res.loss)
+        return self._incumbent
 
     def add_result(self, result: Result):
         self.results.append(result)
+        if self._incumbent is None or (result.loss is not None and
+                                       (self._incumbent.loss is None or result.loss < self._incumbent.loss)):
+            self._incumbent = result
+
+    @property
+    def configspace(self) -> ConfigurationSpace:
+        return self._configspace
+
+    @configspace.setter
+    def configspace(self, configspace: ConfigurationSpace):
+        self._configspace = configspace
+        self._configspace_hash = None
 
     def __hash__(self):
-        return hash(self.configspace)
+        # Hashing a ConfigurationSpace requires a walk over all hyperparameters. Compute it only once
+        if self._configspace_hash is None:
+            self._configspace_hash = hash(self._configspace)
+        return self._configspace_hash
 
     def __eq__(self, other: object) -> bool:
         if isinstance(other, CandidateStructure):
-            return self.configspace == other.configspace
+            return hash(self) == hash(other) and self.configspace == other.configspace
         return False
 
+    def __getstate__(self):
+        # hash of a ConfigurationSpace is not stable between processes. Recompute hash after unpickling
+        state = self.__dict__.copy()
+        state['_configspace_hash'] = None
+        return state
+
     @property
     def steps(self):
         return self.pipeline.steps
@@ -183,7 +268,7 @@ class CandidateStructure:
             'pipeline': self.pipeline.as_list(),
             'cfg_keys': [(key.hash, key.idx) for key in self.cfg_keys],
             'budget': self.budget,
-            'configspace': config_json.write(self.configspace),
+            'configspace': _write_configspace(self.configspace),
         }
 
     def is_proxy(self):
@@ -195,7 +280,7 @@ class CandidateStructure:
         from dswizard.pipeline.pipeline import FlexiblePipeline
 
         # noinspection PyTypeChecker
-        cs = CandidateStructure(config_json.read(raw['configspace']), None, raw['cfg_keys'], raw['budget'])
+        cs = CandidateStructure(_read_configspace(raw['configspace']), None, raw['cfg_keys'], raw['budget'])
         cs.cid = CandidateId(*raw['cid'])
         cs.pipeline = FlexiblePipeline.from_list(raw['pipeline'])
         cs.cfg_keys = [ConfigKey(*tuple) for tuple in raw['cfg_keys']]
@@ -208,6 +293,8 @@ class CandidateStructure:
 
 
 class Job:
+    __slots__ = ('cid', 'time_submitted', 'time_started', 'time_finished', 'result', 'cutoff')
+
     # noinspection PyTypeChecker
     def __init__(self, cid: CandidateId, cutoff: float = None):
         self.cid = cid
@@ -219,6 +306,7 @@ class Job:
 
 
 class EvaluationJob(Job):
+    __slots__ = ('ds', 'cs', 'config', 'cfg_keys')
 
     def __init__(self,
                  ds: Dataset,
@@ -243,6 +331,7 @@ class EvaluationJob(Job):
 
 
 class StructureJob(Job):
+    __slots__ = ('ds', 'cs')
 
     def __init__(self, ds: Dataset, cs: CandidateStructure, cutoff: float = None):
         super().__init__(cs.cid.without_config(), cutoff)
@@ -257,8 +346,11 @@ class Dataset:
                  y: np.ndarray,
                  metric: str = 'f1',
                  cutoff: int = 120):
-        self.X = X
-        self.y = y
+        # Store data once in C order. Otherwise, each split into folds creates a copy of non-contiguous data
+        self.X = np.ascontiguousarray(X)
+        self.y = np.ascontiguousarray(y)
+        self._shm: List['shared_memory.SharedMemory'] = []
+        self._shm_owner = False
 
         if metric not in util.valid_metrics:
             raise KeyError(f'Unknown metric {metric}')
@@ -267,8 +359,91 @@ class Dataset:
 
         self.mf_dict, self.meta_features = MetaFeatureFactory.calculate(X, y, timeout=self.cutoff)
 
+    def share(self) -> None:
+        """
+        Moves X and y to shared memory. Afterwards, only the name of the shared memory block is pickled instead of the
+        complete data when the Dataset is send to another process. Arrays with object dtype can not be shared. The
+        shared arrays are read-only as modifications would be visible in all processes. Sharing is not available prior
+        to Python 3.8.
+        """
+        if shared_memory is None or self._shm or self.X.dtype.hasobject or self.y.dtype.hasobject:
+            return
+        self.X = self._to_shared_memory(self.X)
+        self.y = self._to_shared_memory(self.y)
+        self._shm_owner = True
+
+    def release(self) -> None:
+        """
+        Moves X and y back to private memory and frees the shared memory blocks. Only the Dataset that called `share`
+        owns the blocks and unlinks them. Unpickled copies only hold an attachment that is closed on release or once
+        the copy is garbage collected. Views of the shared arrays, e.g. in derived Datasets, keep the mapping alive
+        until they are collected
+        """
+        if not self._shm:
+            return
+        self.X = self.X.copy()
+        self.y = self.y.copy()
+        for shm in self._shm:
+            try:
+                shm.close()
+            except BufferError:
+                # Views of the shared arrays still exist. The mapping is closed when the views are collected
+                pass
+            if self._shm_owner:
+                shm.unlink()
+        self._shm = []
+        self._shm_owner = False
+
+    def _to_shared_memory(self, array: np.ndarray) -> np.ndarray:
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._shm.append(shm)
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        shared[...] = array
+        shared.setflags(write=False)
+        return shared
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self._shm:
+            state['X'] = (self._shm[0].name, self.X.shape, self.X.dtype)
+            state['y'] = (self._shm[1].name, self.y.shape, self.y.dtype)
+            state['_shm'] = True
+        else:
+            state['_shm'] = False
+        state['_shm_owner'] = False
+        return state
+
+    def __setstate__(self, state):
+        shared = state.pop('_shm', False)
+        self.__dict__.update(state)
+        self._shm = []
+        self._shm_owner = False
+        if shared:
+            for attr in ('X', 'y'):
+                name, shape, dtype = state[attr]
+                shm = self._attach_shared_memory(name)
+                self._shm.append(shm)
+                array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+                # Prevent a single evaluation from corrupting the data of all other workers
+                array.setflags(write=False)
+                setattr(self, attr, array)
+
+
+    @staticmethod
+    def _attach_shared_memory(name: str) -> 'shared_memory.SharedMemory':
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Prior to Python 3.13 each attachment is registered at the resource tracker, which reports the block as
+            # leaked or even unlinks it while the owner still uses it. Attachments do not own the block
+            shm = shared_memory.SharedMemory(name=name)
+            if resource_tracker is not None:
+                resource_tracker.unregister(shm._name, 'shared_memory')
+            return shm
+
 
 class PartialConfig:
+    __slots__ = ('cfg_key', 'config', 'name', 'mf')
 
     def __init__(self, cfg_key: Tuple[float, int],
                  configuration: Configuration,
@@ -291,7 +466,7 @@ class PartialConfig:
         # noinspection PyUnresolvedReferences
         return {
             'config': self.config.get_array().tolist(),
-            'configspace': config_json.write(self.config.configuration_space),
+            'configspace': _write_configspace(self.config.configuration_space),
             'cfg_key': self.cfg_key,
             'name': self.name,
             'mf': self.mf.tolist()
@@ -300,7 +475,7 @@ class PartialConfig:
     @staticmethod
     def from_dict(raw: dict) -> 'PartialConfig':
         # meta data are deserialized via pickle
-        config = Configuration(config_json.read(raw['configspace']), vector=np.array(raw['config']))
+        config = Configuration(_read_configspace(raw['configspace']), vector=np.array(raw['config']))
         # noinspection PyTypeChecker
         return PartialConfig(raw['cfg_key'], config, raw['name'], np.array(raw['mf']))
 
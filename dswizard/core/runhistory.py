@@ -34,7 +34,7 @@ class RunHistory:
                 offset = len(prev.results)
 
                 for i, r in enumerate(structure.results):
-                    prev.results.append(r)
+                    prev.add_result(r)
                     if r.status == StatusType.SUCCESS:
                         # Rename model files so that they can be found during ensemble construction
                         os.rename(os.path.join(workdir, model_file(cid.with_config(i))),
@@ -50,22 +50,17 @@ class RunHistory:
         The incumbent here is the configuration with the smallest loss among all runs on the maximum budget! If no run
         finishes on the maximum budget, None is returned!
         """
-        tmp_list = []
-        for k, v in self.data.items():
-            try:
-                inc = v.get_incumbent()
-                if inc is not None:
-                    tmp_list.append((inc.loss, k))
-            except KeyError:
-                pass
+        structure = None
+        result = None
+        for v in self.data.values():
+            inc = v.get_incumbent()
+            if inc is not None and (result is None or inc.loss < result.loss):
+                structure = v
+                result = inc
 
-        if len(tmp_list) > 0:
-            structure = self.data[min(tmp_list)[1]]
+        if structure is not None:
             # TODO pipeline is not fitted. Maybe store fitted pipeline?
             pipeline = clone(structure.pipeline)
-            result = structure.get_incumbent()
-            if result is None:
-                raise ValueError('Incumbent structure has no config evaluations')
             pipeline.set_hyperparameters(result.config.get_dictionary())
             return pipeline, structure
         return None, None
@@ -1,7 +1,6 @@
 from typing import Optional
 
 import numpy as np
-from sklearn.neighbors import NearestNeighbors
 from sklearn.pipeline import Pipeline
 
 from dswizard.components.meta_features import MetaFeatures
@@ -20,7 +19,6 @@ class SimilarityStore:
         else:
             self.model = None
             self.weight = np.ones(SimilarityStore.N_MF)
-        self.neighbours = NearestNeighbors(metric='wminkowski', p=2, metric_params={'w': self.weight})
 
     def add(self, mf: MetaFeatures):
         mf_normal = self._normalize(mf)
@@ -28,12 +26,21 @@ class SimilarityStore:
             self.mfs = mf_normal.reshape(1, -1)
         else:
             self.mfs = np.append(self.mfs, mf_normal, axis=0)
-        self.neighbours.fit(self.mfs)
 
     def get_similar(self, mf: MetaFeatures):
+        """
+        Finds the most similar stored meta-features using a weighted euclidean distance. A brute-force search over all
+        stored meta-features in a single vectorized operation is faster than maintaining a neighbour index, which has
+        to be rebuilt for each added entry.
+        :return: distance and index of the nearest neighbour in the same format as NearestNeighbors.kneighbors
+        """
         X = self._normalize(mf)
+        if X.shape[1] != self.weight.shape[0]:
+            raise ValueError(f'Expected {self.weight.shape[0]} meta-features, got {X.shape[1]}')
 
-        return self.neighbours.kneighbors(X, n_neighbors=1)
+        distances = np.sqrt(np.square(self.weight * (self.mfs - X[0])).sum(axis=1))
+        idx = int(np.argmin(distances))
+        return np.array([[distances[idx]]]), np.array([[idx]])
 
     def _normalize(self, X):
         # remove unused MF
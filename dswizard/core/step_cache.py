@@ -0,0 +1,91 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Any
+
+import joblib
+import numpy as np
+
+# Number of elements of each input array that are considered for the cache key
+_SAMPLE_SIZE = 1024
+
+
+class StepCache:
+    """
+    Process-wide LRU cache for fitted pipeline steps. Pipelines often share identical prefixes, i.e. the same component
+    with the same hyperparameters applied to the same data. Instead of fitting these steps again, the transformed data
+    and the fitted transformer are reused. The cache is disabled by default and has to be enabled via `enable`.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    @staticmethod
+    def key(transformer, X, y) -> Optional[str]:
+        """
+        Computes the cache key of a configured transformer and its input data. Hashing the complete data on each fit
+        is too expensive. Instead, arrays are identified by their shape, dtype, a strided sample and the sum of all
+        numeric values. The memory location is deliberately ignored as each evaluation creates new fold arrays with
+        the same content.
+        :return: the cache key or None if the transformer can not be hashed
+        """
+        try:
+            return joblib.hash((type(transformer), transformer.get_params(),
+                                StepCache._fingerprint(X), StepCache._fingerprint(y)))
+        except Exception:
+            return None
+
+    @staticmethod
+    def _fingerprint(a):
+        if not isinstance(a, np.ndarray):
+            # Unknown data types are hashed completely
+            return a
+        flat = a.reshape(-1)
+        step = max(1, flat.size // _SAMPLE_SIZE)
+        # Summing is much cheaper than hashing and detects differences outside of the sample
+        total = flat.sum(dtype=np.float64) if a.dtype.kind in 'biuf' else None
+        return a.shape, a.dtype.str, flat[::step], total
+
+    def get(self, key: str) -> Optional[Tuple[Any, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        # Return copies as transformers are refitted and data may be modified in place by later steps
+        Xt, fitted_transformer = entry
+        return Xt.copy(), copy.deepcopy(fitted_transformer)
+
+    def put(self, key: str, Xt, fitted_transformer) -> None:
+        entry = Xt.copy(), copy.deepcopy(fitted_transformer)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+cache = StepCache()
+
+
+def enable(maxsize: int = 32) -> None:
+    """
+    Enables caching of fitted pipeline steps in the current process
+    :param maxsize: maximum number of cached steps
+    """
+    cache.maxsize = maxsize
+
+
+def disable() -> None:
+    cache.maxsize = 0
+    cache.clear()
@@ -36,14 +36,18 @@ class Worker(abc.ABC):
                  logger: logging.Logger = None,
                  wid: str = None,
                  cfg_cache: Optional[ConfigCache] = None,
-                 workdir: str = '/tmp/dswizzard/'):
+                 workdir: str = '/tmp/dswizzard/',
+                 n_jobs: int = 1):
         """
         :param logger: logger used for debugging output
         :param wid: if multiple workers are started in the same process, you MUST provide a unique id for each one of
             them using the `id` argument.
+        :param n_jobs: number of jobs used to evaluate independent parts of a single configuration, e.g. the folds of a
+            cross-validation, in parallel
         """
         self.cfg_cache = cfg_cache
         self.workdir = workdir
+        self.n_jobs = n_jobs
         self.worker_id = f'worker.{wid}'
 
         if logger is None:
@@ -9,5 +9,4 @@ class SuccessiveHalving(BaseIteration):
         """
         SuccessiveHalving simply continues the best based on the current loss.
         """
-        ranks = np.argsort(np.argsort(losses))
-        return ranks < self.num_candidates[self.stage]
+        return self._select_best(losses, self.num_candidates[self.stage])
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import math
 from typing import List
 
 import numpy as np
@@ -36,5 +37,6 @@ class SuccessiveResampling(BaseIteration):
         SuccessiveHalving simply continues the best based on the current loss.
         """
 
-        ranks = np.argsort(np.argsort(losses))
-        return ranks < max(self.min_samples_advance, self.num_candidates[self.stage] * (1 - self.resampling_rate))
+        threshold = max(self.min_samples_advance, self.num_candidates[self.stage] * (1 - self.resampling_rate))
+        # All candidates with a rank below threshold advance
+        return self._select_best(losses, math.ceil(threshold))
@@ -14,14 +14,13 @@ class FixedStructure(BaseStructureGenerator):
         self.steps = steps
 
     def fill_candidate(self, cs: CandidateStructure, ds: Dataset, **kwargs) -> CandidateStructure:
-        cfg_keys = []
+        configspaces = []
         for step, task in self.steps:
             if isinstance(task, ComponentChoice) or isinstance(task, EstimatorComponent):
-                key = self.cfg_cache.get_config_key(configspace=task.get_hyperparameter_search_space(),
-                                                    mf=ds.meta_features)
+                configspaces.append(task.get_hyperparameter_search_space())
             else:
                 raise ValueError(f'Unable to handle type {type(task)}')
-            cfg_keys.append(key)
+        cfg_keys = self.cfg_cache.get_config_keys(configspaces, [ds.meta_features] * len(configspaces))
 
         cs.pipeline = FlexiblePipeline(self.steps)
         cs.configspace = cs.pipeline.get_hyperparameter_search_space(ds.meta_features)
@@ -7,7 +7,6 @@ import random
 import threading
 import timeit
 from abc import ABC
-from copy import deepcopy
 from typing import List, Optional, Tuple, Type, Dict
 
 import joblib
@@ -81,7 +80,10 @@ class Node:
         if pipeline_prefix is None:
             pipeline_prefix = []
         else:
-            pipeline_prefix = deepcopy(pipeline_prefix)
+            # Steps are immutable tuples and the components are never modified: workers fit and configure clones of
+            # the pipeline and FlexiblePipeline._fit clones each transformer. Sibling nodes can therefore share the
+            # components and only the list has to be copied. Revert to a deepcopy if components are ever fitted in place
+            pipeline_prefix = list(pipeline_prefix)
             # TODO check if also add if pipeline_prefix is None
             pipeline_prefix.append((str(id), self.component))
         self.steps: List[Tuple[str, EstimatorComponent]] = pipeline_prefix
@@ -529,7 +531,10 @@ class MCTS(BaseStructureGenerator):
             result = worker.start_transform_dataset(job)
 
             if result.status.value == StatusType.SUCCESS.value:
-                ds = Dataset(result.transformed_X, ds.y, ds.metric, ds.cutoff)
+                # Copy y to not keep a view of a shared memory block of the parent data set
+                ds = Dataset(result.transformed_X, ds.y.copy(), ds.metric, ds.cutoff)
+                # Drop reference to transformed data set. Otherwise it is pickled with each result
+                result.transformed_X = None
                 new_node.partial_config = PartialConfig(key, config, str(new_node.id), ds.meta_features)
                 new_node.ds = ds
 
@@ -563,7 +568,7 @@ class MCTS(BaseStructureGenerator):
 
                         if self.store_ds:
                             with open(os.path.join(self.workdir, f'{new_node.id}.pkl'), 'wb') as f:
-                                pickle.dump(ds, f)
+                                pickle.dump(ds, f, protocol=pickle.HIGHEST_PROTOCOL)
             else:
                 self.logger.debug(f'\t{component.name()} failed with default hyperparamter: {result.status}')
                 result.structure_loss = util.worst_score(ds.metric)[-1]
@@ -582,7 +587,7 @@ class MCTS(BaseStructureGenerator):
                     result.config = FlexiblePipeline(new_node.steps).configuration_space.get_default_configuration()
 
                     job.result = result
-                    self.cfg_cache.register_result(job)
+                    self.cfg_cache.register_result(result, job.cfg_keys, job.config)
                     # Successful classifiers
                     return new_node, result, failure_count
 
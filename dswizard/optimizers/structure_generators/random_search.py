@@ -1,6 +1,6 @@
 import math
 import random
-from typing import Tuple, List
+from typing import Tuple, List, Dict
 
 import numpy as np
 from ConfigSpace import ConfigurationSpace
@@ -14,6 +14,8 @@ from dswizard.core.base_structure_generator import BaseStructureGenerator
 from dswizard.core.model import CandidateStructure, Dataset
 from dswizard.pipeline.pipeline import FlexiblePipeline, SubPipeline
 
+_SUBPIPELINE_NAME = SubPipeline.name()
+
 
 class RandomStructureGenerator(BaseStructureGenerator):
 
@@ -21,53 +23,66 @@ class RandomStructureGenerator(BaseStructureGenerator):
     def __init__(self,
                  max_depth: int = 10,
                  include_basic_estimators: bool = False,
+                 max_attempts: int = 100,
                  **kwargs):
+        """
+        :param max_depth: maximum number of steps of a generated pipeline
+        :param include_basic_estimators: also sample single estimators instead of only component choices
+        :param max_attempts: maximum number of attempts to generate a valid pipeline
+        """
         super().__init__(**kwargs)
 
         self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        # Search spaces of components only depend on the component class
+        self._cs_cache: Dict[type, ConfigurationSpace] = {}
 
-        self.candidates = {
+        candidates = {
             ClassifierChoice.name(),
             DataPreprocessorChoice.name(),
             FeaturePreprocessorChoice.name(),
-            SubPipeline.name()
+            _SUBPIPELINE_NAME
         }
 
         if include_basic_estimators:
             for estimator in classification._classifiers.values():
-                self.candidates.add(estimator.name())
+                candidates.add(estimator.name())
             for estimator in data_preprocessing._preprocessors.values():
-                self.candidates.add(estimator.name())
+                candidates.add(estimator.name())
             for estimator in feature_preprocessing._preprocessors.values():
-                self.candidates.add(estimator.name())
+                candidates.add(estimator.name())
+        # random.sample does not accept sets. Sort candidates for reproducible results with a fixed seed
+        self.candidates: Tuple[str, ...] = tuple(sorted(candidates))
 
     def _determine_depth(self, n_min: int = 1, n_max: int = 2):
         r = int(math.ceil(np.random.normal(0.5, 0.5 / 3) * n_max))
         return max(min(self.max_depth, r), n_min)
 
     def fill_candidate(self, cs: CandidateStructure, ds: Dataset, **kwargs) -> CandidateStructure:
-        attempts = 1
-        while True:
+        max_depth = self.max_depth
+        last_error = None
+        for attempts in range(1, self.max_attempts + 1):
             try:
-                depth = self._determine_depth(n_max=self.max_depth)
+                depth = self._determine_depth(n_max=max_depth)
                 config_space, steps = self._generate_pipeline(depth)
 
                 pipeline = FlexiblePipeline(steps)
-                print(steps)
-                self.logger.debug(f'Created valid pipeline after {attempts} tries')
+                self.logger.debug('Created valid pipeline %s after %d tries', steps, attempts)
 
-                cfg_keys = []
-                for step, task in steps:
-                    key = self.cfg_cache.get_config_key(configspace=task.get_hyperparameter_search_space(),
-                                                        mf=np.ones((1, 1)) * len(cfg_keys))
-                    cfg_keys.append(key)
+                cfg_keys = self.cfg_cache.get_config_keys(
+                    [self._get_search_space(task) for step, task in steps],
+                    [np.ones((1, 1)) * idx for idx in range(len(steps))])
 
                 cs.configspace = config_space
                 cs.pipeline = pipeline
                 cs.cfg_keys = cfg_keys
                 return cs
-            except TypeError:
-                attempts += 1
+            except TypeError as ex:
+                last_error = ex
+                # Shorter pipelines are more likely to be valid
+                if attempts > self.max_attempts // 2:
+                    max_depth = max(1, int(max_depth * 0.9))
+        raise RuntimeError(f'Failed to generate a valid pipeline in {self.max_attempts} attempts: {last_error}')
 
     def _generate_pipeline(self, depth: int) -> \
             Tuple[ConfigurationSpace, List[Tuple[str, EstimatorComponent]]]:
@@ -77,9 +92,9 @@ class RandomStructureGenerator(BaseStructureGenerator):
 
         while i < depth:
             name = f'step_{i}'
-            clazz = random.sample(self.candidates, 1)[0]
+            clazz = random.choice(self.candidates)
 
-            if clazz == SubPipeline.name():
+            if clazz == _SUBPIPELINE_NAME:
                 max_depth = depth - i - 1
                 instance, n = self._generate_subpipelines(max_depth)
 
@@ -93,11 +108,21 @@ class RandomStructureGenerator(BaseStructureGenerator):
                 instance = clazz()
 
             steps.append((name, instance))
-            cs.add_configuration_space(name, instance.get_hyperparameter_search_space())
+            cs.add_configuration_space(name, self._get_search_space(instance))
 
             i += 1
         return cs, steps
 
+    def _get_search_space(self, instance: EstimatorComponent) -> ConfigurationSpace:
+        if isinstance(instance, SubPipeline):
+            # Search space of SubPipelines depends on the sampled sub-steps
+            return instance.get_hyperparameter_search_space()
+        cs = self._cs_cache.get(type(instance))
+        if cs is None:
+            cs = instance.get_hyperparameter_search_space()
+            self._cs_cache[type(instance)] = cs
+        return cs
+
     def _generate_subpipelines(self, max_depth: int) -> Tuple[SubPipeline, int]:
         n_pipelines = random.choice([2, 3, 4])
 
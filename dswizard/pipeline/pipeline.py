@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import copy
 import timeit
-from typing import Dict, List, Tuple, Union, TYPE_CHECKING, Optional
+from typing import Dict, List, Tuple, Union, TYPE_CHECKING, Optional, Iterator
 
+import networkx as nx
 import numpy as np
+from joblib import Parallel, delayed
 from ConfigSpace.configuration_space import Configuration, ConfigurationSpace
 from sklearn.base import BaseEstimator, clone
 from sklearn.pipeline import Pipeline, _fit_transform_one
@@ -11,6 +14,7 @@ from sklearn.utils import _print_elapsed_time
 
 from dswizard.components.base import ComponentChoice, EstimatorComponent
 from dswizard.components.util import prefixed_name
+from dswizard.core import step_cache
 from dswizard.core.model import PartialConfig
 from dswizard.util import util
 
@@ -21,6 +25,27 @@ if TYPE_CHECKING:
     from dswizard.components.meta_features import MetaFeatures
 
 
+def _split_configuration(configuration: dict) -> Dict[str, dict]:
+    """
+    Splits a prefixed configuration into the configurations of the single steps in one pass
+    :param configuration: configuration with keys of the form `<node_name>:<param>`
+    :return: configurations of each step by node name
+    """
+    sub_configurations = {}
+    for param, value in configuration.items():
+        node_name, sep, sub_param = param.partition(':')
+        if sep:
+            sub_configurations.setdefault(node_name, {})[sub_param] = value
+    return sub_configurations
+
+
+def _fit_pipeline(pipeline: FlexiblePipeline, X, y, cfg_cache: Optional[ConfigCache], prefix: str, fit_params: dict):
+    if cfg_cache is not None:
+        pipeline.cfg_cache = cfg_cache
+    # noinspection PyTypeChecker
+    return pipeline.fit(X, y, prefix=prefix, **fit_params)
+
+
 class FlexiblePipeline(Pipeline, BaseEstimator):
 
     def __init__(self,
@@ -31,6 +56,9 @@ class FlexiblePipeline(Pipeline, BaseEstimator):
         self.configuration = None
         self.cfg_keys = cfg_keys
         self.cfg_cache: Optional[ConfigCache] = cfg_cache
+        # Only the last configuration space is cached together with the steps and the mf it was created for
+        self._cs_cache: Optional[Tuple[Tuple, Optional[MetaFeatures], ConfigurationSpace]] = None
+        self._sampled_configs: Dict[int, Tuple[Configuration, ConfigKey]] = {}
 
         # super.__init__ has to be called after initializing all properties provided in constructor
         super().__init__(steps, verbose=False)
@@ -45,7 +73,6 @@ class FlexiblePipeline(Pipeline, BaseEstimator):
             self.set_hyperparameters(configuration)
 
     def to_networkx(self, prefix: str = None):
-        import networkx as nx
         G = nx.DiGraph()
         predecessor = None
         for name, estimator in self.steps_.items():
@@ -73,30 +100,25 @@ class FlexiblePipeline(Pipeline, BaseEstimator):
         return G
 
     def get_step(self, name: str):
-        tokens = name.split(':')
-        step_name = tokens[0]
+        step_name, sep, sub_name = name.partition(':')
 
         estimator = self.steps_[step_name]
-        if isinstance(estimator, SubPipeline) and len(tokens) > 1:
-            pipeline_name = tokens[1]
-
-            n_prefix = len(step_name) + 1 + len(pipeline_name) + 1
-            return estimator.pipelines[pipeline_name].get_step(name[n_prefix:])
+        if isinstance(estimator, SubPipeline) and sep:
+            pipeline_name, _, sub_name = sub_name.partition(':')
+            return estimator.pipelines[pipeline_name].get_step(sub_name)
         return estimator
 
-    def all_names(self, prefix: str = None, exclude_parents: bool = False) -> List[str]:
-        res = []
+    def all_names(self, prefix: str = None, exclude_parents: bool = False) -> Iterator[str]:
         for name, component in self.steps_.items():
             n = prefixed_name(prefix, name)
             if isinstance(component, SubPipeline):
                 if not exclude_parents:
-                    res.append(n)
+                    yield n
 
                 for p_name, p in component.pipelines.items():
-                    res.extend(p.all_names(prefixed_name(name, p_name), exclude_parents))
+                    yield from p.all_names(prefixed_name(name, p_name), exclude_parents)
             else:
-                res.append(n)
-        return res
+                yield n
 
     def _validate_steps(self):
         if len(self.steps) == 0:
@@ -111,31 +133,28 @@ class FlexiblePipeline(Pipeline, BaseEstimator):
              logger: ProcessLogger = None,
              prefix: str = None,
              **fit_params: dict):
-        # shallow copy of steps - this should really be steps_
+        # shallow copy of steps - this should really be steps_. Fitted transformers are stored in self.steps. As the
+        # list is shared with the caller (sklearn's clone requires __init__ to store steps as is), it has to be copied
         self.steps = list(self.steps)
         self._validate_steps()
 
         fit_params_steps = {name: {} for name, step in self.steps
                             if step is not None}
         for pname, pval in fit_params.items():
-            if '__' not in pname:
+            step, sep, param = pname.partition('__')
+            if not sep:
                 raise ValueError(
                     "Pipeline.fit does not accept the {} parameter. "
                     "You can pass parameters to specific steps of your "
                     "pipeline using the stepname__parameter format, e.g. "
                     "`Pipeline.fit(X, y, logisticregression__sample_weight"
                     "=sample_weight)`.".format(pname))
-            step, param = pname.split('__', 1)
             fit_params_steps[step][param] = pval
         Xt = X
-        for (step_idx,
-             name,
-             transformer) in self._iter(with_final=False,
-                                        filter_passthrough=False):
+        # Iterate steps directly instead of sklearn's _iter to avoid its per step overhead
+        for step_idx, (name, transformer) in enumerate(self.steps[:-1]):
             if transformer is None or transformer == 'passthrough':
-                with _print_elapsed_time('Pipeline',
-                                         self._log_message(step_idx)):
-                    continue
+                continue
 
             cloned_transformer = clone(transformer)
 
@@ -163,11 +182,19 @@ class FlexiblePipeline(Pipeline, BaseEstimator):
             else:
                 start = timeit.default_timer()
 
-                Xt, fitted_transformer = _fit_transform_one(
-                    cloned_transformer, Xt, y, None,
-                    message_clsname='Pipeline',
-                    message=self._log_message(step_idx),
-                    **fit_params_steps[name])
+                key = step_cache.cache.key(cloned_transformer, Xt, y) \
+                    if step_cache.cache.enabled and len(fit_params_steps[name]) == 0 else None
+                cached = step_cache.cache.get(key) if key is not None else None
+                if cached is not None:
+                    Xt, fitted_transformer = cached
+                else:
+                    Xt, fitted_transformer = _fit_transform_one(
+                        cloned_transformer, Xt, y, None,
+                        message_clsname='Pipeline',
+                        message=self._log_message(step_idx),
+                        **fit_params_steps[name])
+                    if key is not None:
+                        step_cache.cache.put(key, Xt, fitted_transformer)
 
                 self.fit_time += timeit.default_timer() - start
 
@@ -188,6 +215,8 @@ class FlexiblePipeline(Pipeline, BaseEstimator):
         if self.configuration is None and self.cfg_cache is None:
             raise ValueError(
                 'Pipeline is not configured yet. Either call set_hyperparameters or provide a ConfigGenerator')
+        if self.configuration is None:
+            self._sample_configurations()
 
         Xt, fit_params = self._fit(X, y, logger=logger, prefix=prefix, **fit_params)
         with _print_elapsed_time('Pipeline',
@@ -212,6 +241,8 @@ class FlexiblePipeline(Pipeline, BaseEstimator):
         cfg_key = self.cfg_keys[idx]
         if isinstance(estimator, SubPipeline):
             config, cfg_key = ConfigurationSpace().get_default_configuration(), (0, 0)
+        elif idx in getattr(self, '_sampled_configs', {}):
+            config, cfg_key = self._sampled_configs.pop(idx)
         else:
             config, cfg_key = self.cfg_cache.sample_configuration(cfg_key=cfg_key)
 
@@ -221,44 +252,65 @@ class FlexiblePipeline(Pipeline, BaseEstimator):
         self.config_time += timeit.default_timer() - start
         return config
 
+    def _sample_configurations(self) -> None:
+        # cfg_cache is usually a proxy to another process. Sample configurations for all steps with a single call
+        start = timeit.default_timer()
+
+        indices = [idx for idx, (name, _) in enumerate(self.steps) if not isinstance(self.get_step(name), SubPipeline)]
+        configs = self.cfg_cache.sample_configurations([self.cfg_keys[idx] for idx in indices])
+        self._sampled_configs = dict(zip(indices, configs))
+
+        self.config_time += timeit.default_timer() - start
+
     def set_hyperparameters(self, configuration: dict, init_params=None):
         self.configuration = configuration
+        sub_configurations = _split_configuration(configuration)
+        sub_init_params = _split_configuration(init_params) if init_params is not None else None
 
         for node_idx, (node_name, node) in enumerate(self.steps):
-            sub_configuration_space = node.get_hyperparameter_search_space()
-            sub_config_dict = {}
-            for param in configuration:
-                if param.startswith(f'{node_name}:'):
-                    value = configuration[param]
-                    new_name = param.replace(f'{node_name}:', '', 1)
-                    sub_config_dict[new_name] = value
-
-            sub_configuration = Configuration(sub_configuration_space, values=sub_config_dict)
-
-            if init_params is not None:
-                sub_init_params_dict = {}
-                for param in init_params:
-                    if param.startswith(f'{node_name}:'):
-                        value = init_params[param]
-                        new_name = param.replace(f'{node_name}:', '', 1)
-                        sub_init_params_dict[new_name] = value
+            # configuration has already been validated by its ConfigurationSpace, pass it on as is
+            sub_config_dict = sub_configurations.get(node_name, {})
+
+            if sub_init_params is not None:
+                sub_init_params_dict = sub_init_params.get(node_name, {})
             else:
                 sub_init_params_dict = None
 
             if isinstance(node, (ComponentChoice, EstimatorComponent)):
-                node.set_hyperparameters(configuration=sub_configuration.get_dictionary(),
-                                         init_params=sub_init_params_dict)
+                node.set_hyperparameters(configuration=sub_config_dict, init_params=sub_init_params_dict)
             else:
                 raise NotImplementedError('Not supported yet!')
 
         return self
 
     def get_hyperparameter_search_space(self, mf: Optional[MetaFeatures] = None) -> ConfigurationSpace:
-        cs = ConfigurationSpace()
-        for name, step in self.steps:
-            step_configuration_space = step.get_hyperparameter_search_space(mf=mf)
-            cs.add_configuration_space(name, step_configuration_space)
-        return cs
+        """
+        Returns the configuration space of all steps. The returned configuration space is a copy and may be modified
+        """
+        return copy.deepcopy(self._cached_search_space(mf))
+
+    def _cached_search_space(self, mf: Optional[MetaFeatures] = None) -> ConfigurationSpace:
+        # Building the configuration space is expensive. Reuse it as long as neither the steps nor mf change. The
+        # cached configuration space is shared, therefore it must be treated as read-only
+        key = self._cs_key()
+        cached = getattr(self, '_cs_cache', None)
+        if cached is None or cached[0] != key or cached[1] is not mf:
+            cs = ConfigurationSpace()
+            for name, step in self.steps:
+                if isinstance(step, SubPipeline):
+                    step_configuration_space = step._cached_search_space(mf=mf)
+                else:
+                    step_configuration_space = step.get_hyperparameter_search_space(mf=mf)
+                cs.add_configuration_space(name, step_configuration_space)
+            cached = key, mf, cs
+            self._cs_cache = cached
+        return cached[2]
+
+    def _cs_key(self) -> Tuple:
+        # Steps are compared by identity, including the steps of nested sub-pipelines. Replacing a step via set_params
+        # or assigning steps invalidates the cached configuration space
+        return tuple((name, step, step._cs_key() if isinstance(step, SubPipeline) else None)
+                     for name, step in self.steps)
 
     def items(self):
         return self.steps_.items()
@@ -289,42 +341,65 @@ class FlexiblePipeline(Pipeline, BaseEstimator):
         ds = __load(steps)
         return FlexiblePipeline(ds)
 
+    @property
+    def _name_tuple(self) -> Tuple[str, ...]:
+        # steps_ is not modified after construction, therefore the names can be cached
+        names = self.__dict__.get('_name_tuple_cache')
+        if names is None:
+            names = tuple(e.name() for e in self.steps_.values())
+            self.__dict__['_name_tuple_cache'] = names
+        return names
+
     def __lt__(self, other: 'FlexiblePipeline'):
-        s1 = tuple(e.name() for e in self.steps_.values())
-        s2 = tuple(e.name() for e in other.steps_.values())
-        return s1 < s2
+        return self._name_tuple < other._name_tuple
 
     def __copy__(self):
         return FlexiblePipeline(clone(self.steps, safe=False), self.configuration, self.cfg_cache, self.cfg_keys)
 
+    def __getstate__(self):
+        state = super().__getstate__().copy()
+        # Cached configuration space is rebuilt on demand. Do not send it to other processes with each pipeline
+        state['_cs_cache'] = None
+        return state
+
 
 class SubPipeline(EstimatorComponent):
 
-    def __init__(self, sub_wfs: List[List[Tuple[str, EstimatorComponent]]]):
+    def __init__(self, sub_wfs: List[List[Tuple[str, EstimatorComponent]]], n_jobs: int = 1):
+        """
+        :param sub_wfs: steps of the independent sub-pipelines
+        :param n_jobs: number of sub-pipelines fitted and evaluated in parallel
+        """
+        self.n_jobs = n_jobs
         self.pipelines: Dict[str, FlexiblePipeline] = {}
+        # Only the last configuration space is cached together with the pipelines and the mf it was created for
+        self._cs_cache: Optional[Tuple[Tuple, Optional[MetaFeatures], ConfigurationSpace]] = None
 
         # TODO cfg_keys missing
         ls = list(map(lambda wf: FlexiblePipeline(wf), sub_wfs))
-        for idx, wf in enumerate(sorted(ls)):
+        for idx, wf in enumerate(sorted(ls, key=lambda p: p._name_tuple)):
             self.pipelines[f'pipeline_{idx}'] = wf
 
     def fit(self, X, y=None, cfg_cache: ConfigCache = None, logger: ProcessLogger = None, prefix: str = None,
             **fit_params):
-        for p_name, pipeline in self.pipelines.items():
-            if cfg_cache is not None:
-                pipeline.cfg_cache = cfg_cache
-
-            p_prefix = prefixed_name(prefix, p_name)
-            # noinspection PyTypeChecker
-            pipeline.fit(X, y, prefix=p_prefix, **fit_params)
+        # Sub-pipelines are independent of each other. Threads are used as pipelines are fitted in place and share the
+        # ConfigCache with the caller
+        Parallel(n_jobs=self.n_jobs, prefer='threads')(
+            delayed(_fit_pipeline)(pipeline, X, y, cfg_cache, prefixed_name(prefix, p_name), fit_params)
+            for p_name, pipeline in self.pipelines.items())
         return self
 
     # noinspection PyPep8Naming
     def transform(self, X: np.ndarray):
-        X_transformed = X
-        for name, pipeline in self.pipelines.items():
-            y_pred = pipeline.predict(X)
-            X_transformed = np.hstack((X_transformed, np.reshape(y_pred, (-1, 1))))
+        y_preds = Parallel(n_jobs=self.n_jobs, prefer='threads')(
+            delayed(pipeline.predict)(X) for pipeline in self.pipelines.values())
+
+        # Allocate output once instead of growing it with each prediction
+        n_features = X.shape[1]
+        X_transformed = np.empty((X.shape[0], n_features + len(y_preds)), dtype=np.result_type(X, *y_preds))
+        X_transformed[:, :n_features] = X
+        for idx, y_pred in enumerate(y_preds):
+            X_transformed[:, n_features + idx] = y_pred
 
         return X_transformed
 
@@ -332,25 +407,36 @@ class SubPipeline(EstimatorComponent):
         if configuration is None or len(configuration.keys()) == 0:
             return
 
+        sub_configurations = _split_configuration(configuration)
         for node_name, pipeline in self.pipelines.items():
-            sub_config_dict = {}
-            for param in configuration:
-                if param.startswith(f'{node_name}:'):
-                    value = configuration[param]
-                    new_name = param.replace(f'{node_name}:', '', 1)
-                    sub_config_dict[new_name] = value
-            pipeline.set_hyperparameters(sub_config_dict, init_params)
+            pipeline.set_hyperparameters(sub_configurations.get(node_name, {}), init_params)
 
     def get_hyperparameter_search_space(self, mf: Optional[MetaFeatures] = None):
-        cs = ConfigurationSpace()
-        for pipeline_name, pipeline in self.pipelines.items():
-            pipeline_cs = ConfigurationSpace()
-
-            for task_name, task in pipeline.steps:
-                step_configuration_space = task.get_hyperparameter_search_space(mf=mf)
-                pipeline_cs.add_configuration_space(task_name, step_configuration_space)
-            cs.add_configuration_space(pipeline_name, pipeline_cs)
-        return cs
+        """
+        Returns the configuration space of all sub-pipelines. The returned configuration space is a copy and may be
+        modified
+        """
+        return copy.deepcopy(self._cached_search_space(mf))
+
+    def _cached_search_space(self, mf: Optional[MetaFeatures] = None) -> ConfigurationSpace:
+        key = self._cs_key()
+        cached = getattr(self, '_cs_cache', None)
+        if cached is None or cached[0] != key or cached[1] is not mf:
+            cs = ConfigurationSpace()
+            for pipeline_name, pipeline in self.pipelines.items():
+                cs.add_configuration_space(pipeline_name, pipeline._cached_search_space(mf))
+            cached = key, mf, cs
+            self._cs_cache = cached
+        return cached[2]
+
+    def _cs_key(self) -> Tuple:
+        return tuple((name, pipeline, pipeline._cs_key()) for name, pipeline in self.pipelines.items())
+
+    def __getstate__(self):
+        state = super().__getstate__().copy()
+        # Cached configuration space is rebuilt on demand. Do not send it to other processes with each pipeline
+        state['_cs_cache'] = None
+        return state
 
     def serialize(self):
         pipelines = []
@@ -4,6 +4,7 @@ from typing import Optional, Tuple, Union, List
 
 import joblib
 import numpy as np
+from joblib import Parallel, delayed
 from ConfigSpace import Configuration
 from sklearn import clone
 from sklearn.base import is_classifier
@@ -24,6 +25,12 @@ from dswizard.util.util import model_file
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
+def _fit_and_predict_fold(pipeline, X, y, train, test):
+    cloned_pipeline = clone(pipeline)
+    probability_block = _fit_and_predict(cloned_pipeline, X, y, train, test, 0, {}, 'predict_proba')
+    return probability_block, cloned_pipeline.predict(X), cloned_pipeline
+
+
 class SklearnWorker(Worker):
 
     def compute(self,
@@ -53,11 +60,18 @@ class SklearnWorker(Worker):
         component.set_hyperparameters(config.get_dictionary())
         if is_classifier(component):
             score, y_pred, y_prob, models = self._score(ds, component)
-            try:
-                y_pred = y_pred.astype(float)
-            except ValueError:
-                pass
-            X = np.hstack((ds.X, y_prob, np.reshape(y_pred, (-1, 1))))
+            if not np.issubdtype(y_pred.dtype, np.number):
+                try:
+                    y_pred = y_pred.astype(float)
+                except ValueError:
+                    pass
+            # Write all blocks into a preallocated array. Numeric predictions are converted during the assignment
+            # instead of creating an intermediate float copy
+            n_features = ds.X.shape[1]
+            X = np.empty((ds.X.shape[0], n_features + y_prob.shape[1] + 1), dtype=np.result_type(ds.X, y_prob, y_pred))
+            X[:, :n_features] = ds.X
+            X[:, n_features:-1] = y_prob
+            X[:, -1] = y_pred
         else:
             models = [component.fit(ds.X, ds.y)]
             X = models[0].transform(ds.X)
@@ -67,25 +81,26 @@ class SklearnWorker(Worker):
 
     def _score(self, ds: Dataset, estimator: Union[EstimatorComponent, FlexiblePipeline], n_folds: int = 4):
         y = ds.y
-        y_pred, y_prob, models = self._cross_val_predict(estimator, ds.X, y, cv=n_folds)
+        y_pred, y_prob, models = self._cross_val_predict(estimator, ds.X, y, cv=n_folds, n_jobs=self.n_jobs)
 
         # Meta-learning only considers f1. Calculate f1 score for structure search
         score = [util.score(y, y_prob, y_pred, ds.metric), util.score(y, y_prob, y_pred, 'f1')]
         return score, y_pred, y_prob, models
 
     @staticmethod
-    def _cross_val_predict(pipeline, X, y=None, cv=None):
+    def _cross_val_predict(pipeline, X, y=None, cv=None, n_jobs: int = 1):
         X, y, groups = indexable(X, y, None)
         cv = check_cv(cv, y, classifier=is_classifier(pipeline))
-
-        prediction_blocks = []
-        probability_blocks = []
-        fitted_pipelines = []
-        for train, test in cv.split(X, y, groups):
-            cloned_pipeline = clone(pipeline)
-            probability_blocks.append(_fit_and_predict(cloned_pipeline, X, y, train, test, 0, {}, 'predict_proba'))
-            prediction_blocks.append(cloned_pipeline.predict(X))
-            fitted_pipelines.append(cloned_pipeline)
+        if isinstance(pipeline, FlexiblePipeline) and pipeline.configuration is not None:
+            # Configured pipelines do not sample from the ConfigCache. Do not pickle it to each fold
+            pipeline.cfg_cache = None
+
+        # Folds are independent of each other and can be fitted in parallel
+        folds = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_and_predict_fold)(pipeline, X, y, train, test) for train, test in cv.split(X, y, groups))
+        probability_blocks = [probability_block for probability_block, _, _ in folds]
+        prediction_blocks = [prediction_block for _, prediction_block, _ in folds]
+        fitted_pipelines = [fitted_pipeline for _, _, fitted_pipeline in folds]
 
         # Concatenate the predictions
         probabilities = [prob_block_i for prob_block_i, _ in probability_blocks]
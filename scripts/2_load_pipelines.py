@@ -1,8 +1,15 @@
-import glob
+import ast
+import hashlib
+import itertools
 import os
 import pickle
+import re
+import sys
 from argparse import ArgumentParser
-from typing import List, Union
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Union, Optional, Iterator, Tuple, Callable, Dict
 
 import networkx as nx
 import numpy as np
@@ -11,133 +18,357 @@ from sklearn.pipeline import Pipeline, FeatureUnion
 from sklearn.preprocessing import FunctionTransformer
 from tpot.builtins import StackingEstimator
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Estimators referenced by the TPOT models. Available to eval when falling back to evaluating a model
+# noinspection PyUnresolvedReferences
+from sklearn.ensemble import AdaBoostClassifier
+from sklearn.naive_bayes import BernoulliNB
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble._hist_gradient_boosting.gradient_boosting import HistGradientBoostingClassifier
+from sklearn.svm import SVC
+from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import MaxAbsScaler
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.preprocessing import Normalizer
+from sklearn.preprocessing import QuantileTransformer
+from sklearn.preprocessing import RobustScaler
+from sklearn.preprocessing import StandardScaler
+from sklearn.neural_network import BernoulliRBM
+from sklearn.preprocessing import Binarizer
+from sklearn.decomposition import FactorAnalysis
+from sklearn.decomposition import FastICA
+from sklearn.cluster import FeatureAgglomeration
+from sklearn.feature_selection import GenericUnivariateSelect
+from sklearn.preprocessing import KBinsDiscretizer
+from sklearn.decomposition import KernelPCA
+from sklearn.impute import MissingIndicator
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import PolynomialFeatures
+from sklearn.ensemble import RandomTreesEmbedding
+from sklearn.feature_selection import SelectKBest
+from sklearn.feature_selection import SelectPercentile
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_selection import VarianceThreshold
+from tpot.builtins import OneHotEncoder
+
+
+def _find(base: str, leaf: str) -> Iterator[str]:
+    """
+    Recursively finds all files named leaf below base. Similar to glob with '**', hidden entries are skipped. Uses
+    os.scandir to reuse the file type of each directory entry instead of calling stat per entry
+    """
+    stack = [base]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name == leaf and entry.is_file():
+                    yield entry.path
+
+
+# Increase whenever the parsers change to invalidate all cached results
+_PARSER_VERSION = 3
+_CACHE_DIR = 'fig/.cache'
+
+
+def _cached(file: str, parse: Callable[[str], List], use_cache: bool = True) -> List:
+    """
+    Parses the given file and stores the parsed models in a cache directory. The parsed models are reused as long as
+    the parser version, the modification time and the size of the file are unchanged. If use_cache is False, the file
+    is always parsed and the cache is refreshed
+    """
+    stat = os.stat(file)
+    key = (_PARSER_VERSION, stat.st_mtime_ns, stat.st_size)
+    name = hashlib.blake2b(os.path.abspath(file).encode(), digest_size=16).hexdigest()
+    cache_file = os.path.join(_CACHE_DIR, f'{name}.pkl')
+    if use_cache:
+        try:
+            with open(cache_file, 'rb') as f:
+                cached_key, models = pickle.loads(f.read())
+            if cached_key == key:
+                return models
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            pass
+
+    models = parse(file)
+    try:
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+        with open(cache_file, 'wb') as f:
+            pickle.dump((key, models), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as ex:
+        print(f'Unable to cache {file}: {ex}')
+    return models
 
-def load_tpot(base_dir: str):
-    def resolve_type(step):
+
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def _dump_models(models, file: str) -> None:
+    """
+    Pickles the models. The pickle is compressed with zstandard if it is available
+    """
+    data = pickle.dumps(models, protocol=pickle.HIGHEST_PROTOCOL)
+    if zstandard is not None:
+        data = zstandard.ZstdCompressor(level=3).compress(data)
+    with open(file, 'wb') as f:
+        f.write(data)
+
+
+def _load_models(file: str):
+    with open(file, 'rb') as f:
+        data = f.read()
+    if data.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            raise ImportError(f'{file} is compressed with zstandard but zstandard is not installed')
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return pickle.loads(data)
+
+
+def _call_name(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Call):
+        if isinstance(node.func, ast.Name):
+            return node.func.id
+        if isinstance(node.func, ast.Attribute):
+            return node.func.attr
+    return None
+
+
+def _string_value(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Constant):
+        return node.value if isinstance(node.value, str) else None
+    # String literals are parsed as ast.Str prior to Python 3.8
+    if sys.version_info < (3, 8) and isinstance(node, ast.Str):
+        return node.s
+    return None
+
+
+def _argument(node: ast.Call, name: str, position: int = 0) -> ast.AST:
+    for keyword in node.keywords:
+        if keyword.arg == name:
+            return keyword.value
+    if len(node.args) > position:
+        return node.args[position]
+    raise ValueError(f'Missing argument {name} in {_call_name(node)}')
+
+
+def _named_steps(node: ast.AST) -> Iterator[Tuple[ast.AST, ast.AST]]:
+    if not isinstance(node, ast.List):
+        raise ValueError(f'Expected list of steps, got {type(node).__name__}')
+    for elem in node.elts:
+        if not isinstance(elem, ast.Tuple) or len(elem.elts) != 2:
+            raise ValueError('Expected (name, estimator) tuple')
+        yield elem.elts[0], elem.elts[1]
+
+
+def _parse_all(files: Iterator[str], parse: Callable[[str], List], initializer: Callable[[], None] = None,
+               use_cache: bool = True) -> List:
+    """
+    Parses all files in parallel. Parsing is dominated by eval and unpickling, therefore processes are used
+    """
+    models = []
+    with ProcessPoolExecutor(initializer=initializer) as ex:
+        for result in ex.map(partial(_cached, parse=parse, use_cache=use_cache), files, chunksize=4):
+            models.extend(result)
+    return models
+
+
+def _resolve_tpot_node(node: ast.AST):
+    # Same as _resolve_tpot_type but on the syntax tree. Avoids instantiating all estimators only to obtain their names
+    name = _call_name(node)
+    if name is None:
+        raise ValueError(f'Unexpected expression {ast.dump(node)}')
+    if name == 'StackingEstimator':
+        estimator = _call_name(_argument(node, 'estimator'))
+        if estimator is None:
+            raise ValueError('Unexpected estimator in StackingEstimator')
+        return estimator
+    elif name == 'FeatureUnion':
+        ls = []
+        for _, trans in _named_steps(_argument(node, 'transformer_list')):
+            if _call_name(trans) == 'FunctionTransformer':
+                ls.append('Clone')
+            else:
+                ls.append(_resolve_tpot_node(trans))
+        return ls
+    else:
+        return name
+
+
+def _parse_tpot_model(input: str) -> List[Union[str, List]]:
+    tree = ast.parse(input, mode='eval').body
+    if not isinstance(tree, ast.Dict):
+        raise ValueError('Expected dict')
+    pipeline = None
+    for key, value in zip(tree.keys, tree.values):
+        if _string_value(key) == 'pipeline':
+            pipeline = value
+    name = _call_name(pipeline)
+    if name == 'Pipeline':
+        steps = [step for _, step in _named_steps(_argument(pipeline, 'steps'))]
+    elif name == 'make_pipeline':
+        steps = pipeline.args
+    else:
+        raise ValueError(f'Unexpected pipeline {name}')
+    return [_resolve_tpot_node(step) for step in steps]
+
+
+def _type_name(step) -> str:
+    return type(step).__name__
+
+
+def _resolve_tpot_stacking(step: StackingEstimator) -> str:
+    return type(step.estimator).__name__
+
+
+def _resolve_tpot_union(step: FeatureUnion) -> List:
+    ls = []
+    for _, trans in step.transformer_list:
+        if isinstance(trans, FunctionTransformer):
+            ls.append('Clone')
+        else:
+            ls.append(_resolve_tpot_type(trans))
+    return ls
+
+
+# Handler for each concrete step type. Filled on first occurrence of a type to also cover subclasses
+_tpot_handlers: Dict[type, Callable] = {}
+
+
+def _resolve_tpot_type(step):
+    handler = _tpot_handlers.get(type(step))
+    if handler is None:
         if isinstance(step, StackingEstimator):
-            return type(step.estimator).__name__
+            handler = _resolve_tpot_stacking
         elif isinstance(step, FeatureUnion):
-            ls = []
-            for _, trans in step.transformer_list:
-                if isinstance(trans, FunctionTransformer):
-                    ls.append('Clone')
-                else:
-                    ls.append(resolve_type(trans))
-            return ls
+            handler = _resolve_tpot_union
         else:
-            return type(step).__name__
+            handler = _type_name
+        _tpot_handlers[type(step)] = handler
+    return handler(step)
 
-    # noinspection PyUnresolvedReferences
-    def load_model(input: str):
-        from sklearn.ensemble import AdaBoostClassifier
-        from sklearn.naive_bayes import BernoulliNB
-        from sklearn.tree import DecisionTreeClassifier
-
-        from sklearn.ensemble._hist_gradient_boosting.gradient_boosting import HistGradientBoostingClassifier
-        from sklearn.svm import SVC
-        from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
-        from sklearn.naive_bayes import MultinomialNB
-        from sklearn.ensemble import RandomForestClassifier
-        from sklearn.linear_model import SGDClassifier
-
-        from sklearn.preprocessing import MaxAbsScaler
-        from sklearn.preprocessing import MinMaxScaler
-        from sklearn.preprocessing import Normalizer
-        from sklearn.preprocessing import QuantileTransformer
-        from sklearn.preprocessing import RobustScaler
-        from sklearn.preprocessing import StandardScaler
-
-        from sklearn.neural_network import BernoulliRBM
-        from sklearn.preprocessing import Binarizer
-        from sklearn.decomposition import FactorAnalysis
-        from sklearn.decomposition import FastICA
-        from sklearn.cluster import FeatureAgglomeration
-        from sklearn.feature_selection import GenericUnivariateSelect
-        from sklearn.preprocessing import KBinsDiscretizer
-        from sklearn.decomposition import KernelPCA
-        from sklearn.impute import MissingIndicator
-        from sklearn.decomposition import PCA
-        from sklearn.preprocessing import PolynomialFeatures
-        from sklearn.ensemble import RandomTreesEmbedding
-        from sklearn.feature_selection import SelectKBest
-        from sklearn.feature_selection import SelectPercentile
-        from sklearn.decomposition import TruncatedSVD
-        from sklearn.feature_selection import VarianceThreshold
-
-        from sklearn.pipeline import FeatureUnion
-        from sklearn.preprocessing import FunctionTransformer
-        from tpot.builtins import OneHotEncoder
-        from tpot.builtins import StackingEstimator
-        import numpy as np
 
-        try:
-            pipeline: Pipeline = eval(input)['pipeline']
-        except Exception as ex:
-            print(file)
-            print(input)
-            pipeline = None
-        return pipeline
+def _load_tpot_model(input: str, file: str):
+    try:
+        pipeline: Pipeline = eval(input)['pipeline']
+    except Exception as ex:
+        print(file)
+        print(input)
+        pipeline = None
+    return pipeline
 
-    models = []
-    for file in glob.glob(os.path.join(base_dir, 'tpot/**/models.txt'), recursive=True):
-        with open(file, 'r') as f:
-            content = ''.join(f.readlines())
-            for e in content.split('}'):
-                if not e.strip():
-                    continue
-                pipeline = load_model(e + '}')
+
+# Each model is stored as a dict literal without nested braces
+_TPOT_MODEL = re.compile(r'[^}]*}')
+
+
+def _parse_tpot_file(file: str) -> List:
+    parsed = []
+    with open(file, 'r') as f:
+        content = f.read()
+        for match in _TPOT_MODEL.finditer(content):
+            e = match.group(0)
+            if not e[:-1].strip():
+                continue
+            steps = ['LabelEncoder', 'SimpleImputer']
+            try:
+                steps.extend(_parse_tpot_model(e))
+            except (SyntaxError, ValueError):
+                # Fall back to evaluating the model for unknown structures
+                pipeline = _load_tpot_model(e, file)
                 if pipeline is None:
                     continue
-
-                steps = ['LabelEncoder', 'SimpleImputer']
                 for _, step in pipeline.steps:
-                    steps.append(resolve_type(step))
-                models.append(steps)
-    return models
+                    steps.append(_resolve_tpot_type(step))
+            parsed.append(steps)
+    return parsed
+
+
+def load_tpot(base_dir: str, use_cache: bool = True):
+    return _parse_all(_find(os.path.join(base_dir, 'tpot'), 'models.txt'), _parse_tpot_file, use_cache=use_cache)
+
+
+_AUTOSKLEARN_RENAME = {
+    'AdaboostClassifier': 'AdaBoostClassifier',
+    'BinarizerComponent': 'Binarizer',
+    'CategoricalImputation': 'SimpleImputer',
+    'DecisionTree': 'DecisionTreeClassifier',
+    'GenericUnivariateSelectComponent': 'GenericUnivariateSelect',
+    'GradientBoostingClassifier': 'HistGradientBoostingClassifier',
+    'KBinsDiscretizerComponent': 'KBinsDiscretizer',
+    'LDA': 'LinearDiscriminantAnalysis',
+    'LibSVM_SVC': 'SVC',
+    'MinMaxScalerComponent': 'MinMaxScaler',
+    'NormalizerComponent': 'Normalizer',
+    'NumericalImputation': 'SimpleImputer',
+    'QuantileTransformerComponent': 'QuantileTransformer',
+    'RandomForest': 'RandomForestClassifier',
+    'RobustScalerComponent': 'RobustScaler',
+    'SGD': 'SGDClassifier',
+    'StandardScalerComponent': 'StandardScaler',
+    'SelectPercentileClassification': 'SelectPercentile'
+}
+
 
+def _init_autosklearn_worker():
+    with open('fig/configspace.pkl', 'rb') as f:
+        cs = pickle.loads(f.read())
+
+    from autosklearn.pipeline.classification import SimpleClassificationPipeline
+    SimpleClassificationPipeline._get_hyperparameter_search_space = lambda *args, **kwargs: cs
 
-def load_autosklearn(base_dir: str):
-    rename = {
-        'AdaboostClassifier': 'AdaBoostClassifier',
-        'BinarizerComponent': 'Binarizer',
-        'CategoricalImputation': 'SimpleImputer',
-        'DecisionTree': 'DecisionTreeClassifier',
-        'GenericUnivariateSelectComponent': 'GenericUnivariateSelect',
-        'GradientBoostingClassifier': 'HistGradientBoostingClassifier',
-        'KBinsDiscretizerComponent': 'KBinsDiscretizer',
-        'LDA': 'LinearDiscriminantAnalysis',
-        'LibSVM_SVC': 'SVC',
-        'MinMaxScalerComponent': 'MinMaxScaler',
-        'NormalizerComponent': 'Normalizer',
-        'NumericalImputation': 'SimpleImputer',
-        'QuantileTransformerComponent': 'QuantileTransformer',
-        'RandomForest': 'RandomForestClassifier',
-        'RobustScalerComponent': 'RobustScaler',
-        'SGD': 'SGDClassifier',
-        'StandardScalerComponent': 'StandardScaler',
-        'SelectPercentileClassification': 'SelectPercentile'
-    }
 
+def _parse_autosklearn_file(file: str) -> List:
     from autosklearn.pipeline.base import AutoSklearnChoice
     from autosklearn.pipeline.components.data_preprocessing.data_preprocessing import DataPreprocessor
 
+    rename = _AUTOSKLEARN_RENAME
+
+    def resolve_choice(step):
+        name = type(step.estimator).__name__
+        return rename[name] if name in rename else name
+
+    def resolve_preprocessor(step):
+        ls = []
+        for _, pipeline in step._transformers:
+            tmp = []
+            for _, s in pipeline.steps:
+                t = resolve_type(s)
+                if t not in {'CategoryShift', 'NoCoalescence', 'NoEncoding', 'NoRescalingComponent'}:
+                    tmp.append(t)
+            ls.append(tmp)
+        return ls
+
+    def resolve_default(step):
+        name = type(step).__name__
+        return rename[name] if name in rename else name
+
+    handlers: Dict[type, Callable] = {}
+
     def resolve_type(step):
-        if isinstance(step, AutoSklearnChoice):
-            name = type(step.estimator).__name__
-            return rename[name] if name in rename else name
-        elif isinstance(step, DataPreprocessor):
-            ls = []
-            for _, pipeline in step._transformers:
-                tmp = []
-                for _, s in pipeline.steps:
-                    t = resolve_type(s)
-                    if t not in {'CategoryShift', 'NoCoalescence', 'NoEncoding', 'NoRescalingComponent'}:
-                        tmp.append(t)
-                ls.append(tmp)
-            return ls
-        else:
-            name = type(step).__name__
-            return rename[name] if name in rename else name
+        handler = handlers.get(type(step))
+        if handler is None:
+            if isinstance(step, AutoSklearnChoice):
+                handler = resolve_choice
+            elif isinstance(step, DataPreprocessor):
+                handler = resolve_preprocessor
+            else:
+                handler = resolve_default
+            handlers[type(step)] = handler
+        return handler(step)
 
     # noinspection PyUnresolvedReferences
     def load_model(input: str):
@@ -159,74 +390,61 @@ def load_autosklearn(base_dir: str):
             print(ex, input)
             return []
 
-    with open('fig/configspace.pkl', 'rb') as f:
-        cs = pickle.load(f)
-
-    from autosklearn.pipeline.classification import SimpleClassificationPipeline
-    SimpleClassificationPipeline._get_hyperparameter_search_space = lambda *args, **kwargs: cs
+    with open(file, 'r') as f:
+        content = f.read()
+        return load_model(content)
 
-    models = []
-    for file in glob.glob(os.path.join(base_dir, 'autosklearn/**/models.txt'), recursive=True):
-        with open(file, 'r') as f:
-            content = ''.join(f.readlines())
-            models.extend(load_model(content))
-    return models
 
+def load_autosklearn(base_dir: str, use_cache: bool = True):
+    # The configspace has to be patched in each worker before any model is evaluated
+    return _parse_all(_find(os.path.join(base_dir, 'autosklearn'), 'models.txt'), _parse_autosklearn_file,
+                      initializer=_init_autosklearn_worker, use_cache=use_cache)
 
-def load_dswizard(base_dir: str, variant: str):
-    def load_model(ensemble):
-        from dswizard.components.base import NoopComponent
 
-        ls = []
-        for pipeline in ensemble.estimators_:
-            pip = []
-            for _, est in pipeline.steps:
-                est = est.estimator
-
-                if isinstance(est, ColumnTransformer):
-                    est = est.transformers[0][1]
-                if isinstance(est, NoopComponent):
-                    continue
-                pip.append(type(est).__name__)
-            ls.append(pip)
-        return ls
+def _parse_dswizard_file(file: str) -> List:
+    from dswizard.components.base import NoopComponent
 
-    models = []
-    for file in glob.glob(os.path.join(base_dir, variant, '**/models.pkl'), recursive=True):
-        print(file)
-        with open(file, 'rb') as f:
+    print(file)
+    with open(file, 'rb') as f:
+        try:
+            tmp = pickle.loads(f.read())
             try:
-                tmp = pickle.load(f)
-                try:
-                    _, ensemble = tmp
-                except ValueError:
-                    _, ensemble, _ = tmp
-                models.extend(load_model(ensemble))
-            except EOFError as ex:
-                print(ex)
-    return models
+                _, ensemble = tmp
+            except ValueError:
+                _, ensemble, _ = tmp
+        except EOFError as ex:
+            print(ex)
+            return []
+
+    ls = []
+    for pipeline in ensemble.estimators_:
+        pip = []
+        for _, est in pipeline.steps:
+            est = est.estimator
+
+            if isinstance(est, ColumnTransformer):
+                est = est.transformers[0][1]
+            if isinstance(est, NoopComponent):
+                continue
+            pip.append(type(est).__name__)
+        ls.append(pip)
+    return ls
+
+
+def load_dswizard(base_dir: str, variant: str, use_cache: bool = True):
+    return _parse_all(_find(os.path.join(base_dir, variant), 'models.pkl'), _parse_dswizard_file, use_cache=use_cache)
 
 
 def flatten(models: List[Union[str, List]]):
     flattened = []
+    intern = sys.intern
     for pipeline in models:
-        candidates = [[]]
-        for step in pipeline:
-            if isinstance(step, str):
-                for candidate in candidates:
-                    candidate.append(step)
-            else:
-                new_candidates = []
-                for candidate in candidates:
-                    for elem in step:
-                        cp = candidate.copy()
-                        if isinstance(elem, str):
-                            cp.append(elem)
-                        else:
-                            cp.extend(elem)
-                        new_candidates.append(cp)
-                candidates = new_candidates
-        flattened.extend(candidates)
+        # Alternatives for each step. Nested lists are expanded into multiple steps. Unpickled step names are separate
+        # copies, interning them shares a single instance per name and speeds up all later lookups
+        groups = [((intern(step),),) if isinstance(step, str) else
+                  tuple((intern(elem),) if isinstance(elem, str) else tuple(map(intern, elem)) for elem in step)
+                  for step in pipeline]
+        flattened.extend(list(itertools.chain.from_iterable(combination)) for combination in itertools.product(*groups))
     return flattened
 
 
@@ -270,164 +488,161 @@ replacements = {
 }
 
 
-def coalesce(models: List[Union[str, List[str]]]):
+def coalesce_and_prefix(models: List[List[str]]) -> Tuple[List[List[str]], List[List[str]]]:
+    """
+    Replaces the step names by their category and prefixes each step with its position in a single pass
+    :return: coalesced pipelines and coalesced pipelines with prefixed step names
+    """
     coalesced = []
-    for pipeline in models:
-        coalesced.append([replacements.get(step, step) for step in pipeline])
-    return coalesced
-
-
-def to_prefixed_names(models: List[Union[str, List[str]]]):
     prefixed = []
+    get = replacements.get
+    prefix = '{}_{}'.format
+    intern = sys.intern
     for pipeline in models:
-        prefixed.append(['__ROOT'] + [f'{idx}_{name}' for idx, name in enumerate(pipeline)])
-    return prefixed
+        steps = list(map(get, pipeline, pipeline))
+        coalesced.append(steps)
+        prefixed.append(['__ROOT', *map(intern, map(prefix, itertools.count(), steps))])
+    return coalesced, prefixed
+
+
+def _draw(G: nx.Graph, file: str, prog: str) -> None:
+    """
+    Renders the graph with graphviz. Rendering is skipped if the graph did not change since file was last rendered
+    """
+    content = repr((prog, sorted(G.nodes(data=True)), sorted(G.edges(data=True))))
+    digest = hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+    hash_file = f'{file}.hash'
+    try:
+        with open(hash_file, 'r') as f:
+            if f.read() == digest and os.path.exists(file):
+                return
+    except OSError:
+        pass
+
+    H = nx.nx_agraph.to_agraph(G)
+    H.draw(file, prog=prog)
+    with open(hash_file, 'w') as f:
+        f.write(digest)
 
 
 def build_graph(models: List[List[str]], name: str, prune_factor: float = 0.025) -> nx.Graph:
-    G = nx.DiGraph()
+    edge_counts = Counter()
     for pipeline in models:
-        for i in range(len(pipeline) - 1):
-            data = G.get_edge_data(pipeline[i], pipeline[i + 1])
-            if data is None:
-                G.add_edge(pipeline[i], pipeline[i + 1], weight=1.0)
-            else:
-                data['weight'] = data['weight'] + 1.0
+        edge_counts.update(zip(pipeline, pipeline[1:]))
 
     max_weight = len(models)
-    for u, v in G.edges():
-        weight = G[u][v]['weight'] / max_weight
-        G[u][v]['weight'] = weight
-        G[u][v]['label'] = f'{G[u][v]["weight"]:.4f}'
-        G[u][v]['fontsize'] = 5
-        G[u][v]['penwidth'] = max(0.25, 6 * weight)
+    G = nx.DiGraph()
+    G.add_edges_from((u, v, {'weight': count / max_weight,
+                             'label': f'{count / max_weight:.4f}',
+                             'fontsize': 5,
+                             'penwidth': max(0.25, 6 * count / max_weight)})
+                     for (u, v), count in edge_counts.items())
 
     for n, data in G.nodes(data=True):
         # data['label'] = n[2:]
-        weight = sum([G[p][n]['weight'] for p in G.predecessors(n)])
+        weight = sum(d['weight'] for d in G.pred[n].values())
         if weight < prune_factor:
-            G.nodes[n]['fillcolor'] = 'gray'
-            G.nodes[n]['style'] = 'filled'
+            data['fillcolor'] = 'gray'
+            data['style'] = 'filled'
 
-    H = nx.nx_agraph.to_agraph(G)
-    H.draw(f'fig/{name}_full.pdf', prog='dot')
+    _draw(G, f'fig/{name}_full.pdf', prog='dot')
 
+    # Edge labels, fontsize and penwidth were already set when the edges were created and remain valid after pruning
     min_weight = 3 / len(models)
-    to_remove = []
-    for u, v in G.edges():
-        if G[u][v]['weight'] < min_weight:
-            to_remove.append((u, v))
-    G.remove_edges_from(to_remove)
+    G.remove_edges_from([(u, v) for u, v, weight in G.edges(data='weight') if weight < min_weight])
     # G.remove_nodes_from(list(nx.isolates(G)))
 
-    for u, v in G.edges():
-        G[u][v]['label'] = f'{G[u][v]["weight"]:.4f}'
-        G[u][v]['fontsize'] = 5
-        G[u][v]['penwidth'] = max(0.25, 6 * G[u][v]['weight'])
-
-    H = nx.nx_agraph.to_agraph(G)
-    H.draw(f'fig/{name}_pruned.pdf', prog='dot')
+    _draw(G, f'fig/{name}_pruned.pdf', prog='dot')
 
     return G
 
 
 def build_circo_graph(models: List[List[str]], name: str, start: int = 0, prune_factor: float = 0.01,
                       normalize: bool = True) -> nx.Graph:
-    G = nx.DiGraph()
-    total_edges = 0
-    total_nodes = 0
-
-    print(name, np.mean(np.array([len(p) - start for p in models])), np.std(np.array([len(p) - start for p in models])))
-
-    for pipeline in models:
-        for i in range(start, len(pipeline)):
-            total_nodes += 1
-            try:
-                G.nodes[pipeline[i]]['weight'] += 1
-            except KeyError:
-                G.add_node(pipeline[i], weight=1)
-
-    for pipeline in models:
-        if start == len(pipeline) - 1:
-            total_edges += 1
-
-        for i in range(start, len(pipeline) - 1):
-            total_edges += 1
-            data = G.get_edge_data(pipeline[i], pipeline[i + 1])
-            if data is None:
-                G.add_edge(pipeline[i], pipeline[i + 1], weight=1.0)
-            else:
-                data['weight'] = data['weight'] + 1.0
+    lengths = np.fromiter((len(p) for p in models), dtype=np.int32, count=len(models)) - start
+    print(name, lengths.mean(), lengths.std())
+
+    # Map each step to an integer id and concatenate all pipelines into a single id array
+    node_id = {}
+    setdefault = node_id.setdefault
+    ids = np.fromiter((setdefault(step, len(node_id)) for pipeline in models for step in pipeline[start:]),
+                      dtype=np.int64)
+    names = list(node_id)
+    n_nodes = len(names)
+    steps = np.maximum(lengths, 0)
+
+    node_counts = np.bincount(ids, minlength=n_nodes)
+    total_nodes = node_counts.sum()
+    # Pipelines with a single step are counted as one edge
+    total_edges = np.maximum(steps - 1, 1)[steps > 0].sum()
+
+    # Transitions between consecutive ids, except from the last step of a pipeline to the first step of the next one
+    valid = np.ones(max(ids.shape[0] - 1, 0), dtype=bool)
+    ends = np.cumsum(steps)[:-1]
+    valid[ends[(ends > 0) & (ends < ids.shape[0])] - 1] = False
+    packed = ids[:-1][valid] * n_nodes + ids[1:][valid]
+    edges, first, edge_counts = np.unique(packed, return_index=True, return_counts=True)
+    # Keep edges in order of their first occurrence
+    order = np.argsort(first, kind='stable')
+    edge_weights = edge_counts[order] / total_edges
 
     def scale(x: float, borders=(0.01, 0.8), offset: float = 0.15):
         return (1 - offset) * (x - borders[0]) / (borders[1] - borders[0]) + offset if normalize else x
 
-    for u, v in G.edges():
-        G[u][v]['weight'] /= total_edges
-        G[u][v]['label'] = f'{scale(G[u][v]["weight"], borders=(0.01, 0.25)):.4f}'
-    for n in G.nodes():
-        G.nodes[n]['weight'] /= total_nodes
-
-    to_remove = []
-    for u, v in G.edges():
-        if G[u][v]['weight'] < prune_factor:
-            to_remove.append((u, v))
-    G.remove_edges_from(to_remove)
-
-    for n in G.nodes():
-        weight = G.nodes[n]['weight']
-        G.nodes[n]['label'] = f'{n}: {weight:.4f}'
+    G = nx.DiGraph()
+    G.add_nodes_from((n, {'weight': weight}) for n, weight in zip(names, (node_counts / total_nodes).tolist()))
+    G.add_edges_from((names[edge // n_nodes], names[edge % n_nodes],
+                      {'weight': weight, 'label': f'{scale(weight, borders=(0.01, 0.25)):.4f}'})
+                     for edge, weight in zip(edges[order].tolist(), edge_weights.tolist()))
+
+    G.remove_edges_from([(u, v) for u, v, weight in G.edges(data='weight') if weight < prune_factor])
+
+    for n, data in G.nodes(data=True):
+        weight = data['weight']
+        data['label'] = f'{n}: {weight:.4f}'
         if weight < prune_factor:
-            G.nodes[n]['fillcolor'] = 'gray'
-            G.nodes[n]['style'] = 'filled'
+            data['fillcolor'] = 'gray'
+            data['style'] = 'filled'
 
-    H = nx.nx_agraph.to_agraph(G)
-    H.draw(f'fig/{name}_circo.pdf', prog='circo')
+    _draw(G, f'fig/{name}_circo.pdf', prog='circo')
 
     return G
 
 
-parser = ArgumentParser()
-parser.add_argument('base_dir', type=str, help='Base dir containing raw results')
-parser.add_argument('--load', type=bool, help='Load raw results instead of cache', default=False)
-args = parser.parse_args()
-
-base_dir = args.base_dir
-if args.load:
-    autosklearn = load_autosklearn(base_dir)
-    tpot = load_tpot(base_dir)
-    dswizard = load_dswizard(base_dir, 'dswizard')
-    dswizard_star = load_dswizard(base_dir, 'dswizard_star')
-    with open('fig/models.pkl', 'wb') as f:
-        pickle.dump((autosklearn, dswizard, dswizard_star, tpot), f)
-else:
-    with open('fig/models.pkl', 'rb') as f:
-        autosklearn, dswizard, dswizard_star, tpot = pickle.load(f)
-
-tpot = flatten(tpot)
-tpot = coalesce(tpot)
-build_circo_graph(tpot, 'tpot', start=2)
-tpot = to_prefixed_names(tpot)
-build_graph(tpot, 'tpot')
-print(tpot)
-
-autosklearn = flatten(autosklearn)
-autosklearn = coalesce(autosklearn)
-build_circo_graph(autosklearn, 'autosklearn', start=1)
-autosklearn = to_prefixed_names(autosklearn)
-build_graph(autosklearn, 'autosklearn')
-print(autosklearn)
-
-dswizard = flatten(dswizard)
-dswizard = coalesce(dswizard)
-build_circo_graph(dswizard, 'dswizard')
-dswizard = to_prefixed_names(dswizard)
-build_graph(dswizard, 'dswizard')
-print(dswizard)
-
-dswizard_star = flatten(dswizard_star)
-dswizard_star = coalesce(dswizard_star)
-build_circo_graph(dswizard_star, 'dswizard_star')
-dswizard_star = to_prefixed_names(dswizard_star)
-build_graph(dswizard_star, 'dswizard_star')
-print(dswizard_star)
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('base_dir', type=str, help='Base dir containing raw results')
+    parser.add_argument('--load', type=bool, help='Load raw results instead of cache', default=False)
+    args = parser.parse_args()
+
+    base_dir = args.base_dir
+    if args.load or not os.path.exists('fig/models.pkl'):
+        # Reparse all raw results if requested explicitly. Otherwise, reuse the parsed files
+        use_cache = not args.load
+        autosklearn = load_autosklearn(base_dir, use_cache)
+        tpot = load_tpot(base_dir, use_cache)
+        dswizard = load_dswizard(base_dir, 'dswizard', use_cache)
+        dswizard_star = load_dswizard(base_dir, 'dswizard_star', use_cache)
+        _dump_models((autosklearn, dswizard, dswizard_star, tpot), 'fig/models.pkl')
+    else:
+        autosklearn, dswizard, dswizard_star, tpot = _load_models('fig/models.pkl')
+
+    tpot, tpot_prefixed = coalesce_and_prefix(flatten(tpot))
+    build_circo_graph(tpot, 'tpot', start=2)
+    build_graph(tpot_prefixed, 'tpot')
+    print(tpot_prefixed)
+
+    autosklearn, autosklearn_prefixed = coalesce_and_prefix(flatten(autosklearn))
+    build_circo_graph(autosklearn, 'autosklearn', start=1)
+    build_graph(autosklearn_prefixed, 'autosklearn')
+    print(autosklearn_prefixed)
+
+    dswizard, dswizard_prefixed = coalesce_and_prefix(flatten(dswizard))
+    build_circo_graph(dswizard, 'dswizard')
+    build_graph(dswizard_prefixed, 'dswizard')
+    print(dswizard_prefixed)
+
+    dswizard_star, dswizard_star_prefixed = coalesce_and_prefix(flatten(dswizard_star))
+    build_circo_graph(dswizard_star, 'dswizard_star')
+    build_graph(dswizard_star_prefixed, 'dswizard_star')
+    print(dswizard_star_prefixed)
@@ -9,19 +9,13 @@ warnings.filterwarnings("ignore", category=UserWarning)
 
 
 def impute_missing(df: pd.DataFrame):
-    def fill(row):
-        if np.isnan(row['result']):
-            if row['metric'] == 'auc':
-                res = 0
-            elif row['metric'] == 'logloss':
-                res = 4
-            else:
-                raise ValueError(f'Unknown metric {row["metric"]}')
-        else:
-            res = row['result']
-        return res
+    missing = df['result'].isna()
+    unknown = missing & ~df['metric'].isin(('auc', 'logloss'))
+    if unknown.any():
+        raise ValueError(f'Unknown metric {df.loc[unknown, "metric"].iloc[0]}')
 
-    df['result'] = df.apply(fill, axis=1)
+    df.loc[missing & (df['metric'] == 'auc'), 'result'] = 0
+    df.loc[missing & (df['metric'] == 'logloss'), 'result'] = 4
 
 
 def compute_statistics(df: pd.DataFrame):